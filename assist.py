@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Placement assistant for low-input-bandwidth players.
+#
+# For the falling stone, every reachable final placement is enumerated by
+# a breadth-first search over (rotation, x, y) using the same moves the
+# player has: left, right, rotate and soft drop.  Each placement keeps the
+# shortest input sequence that reaches it, and is scored with a pluggable
+# heuristic on the board it leaves behind.  The player then picks one of
+# the top K with a single dwell and the assistant replays its inputs.
+#
+# Searches are memoized on the board and stone position, so recomputing
+# every frame is free until something changes.  An optional lookahead
+# that also places next_stone runs in a process pool and is polled, so
+# it never blocks the render loop.  Its scores hold for the whole fall
+# of a stone; gravity steps only re-map them onto the new placements.
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import board
+from board import cols, rows
+from pieces import piece_table
+
+# Lines are scored as in engine.add_cl_lines; the weights below are the
+# commonly used ones for height, lines, holes and bumpiness.
+height_weight = -0.510066
+lines_weight = 0.760666
+holes_weight = -0.35663
+bumpiness_weight = -0.184483
+
+
+def column_heights(cells):
+    heights = [0] * cols
+    for x in range(cols):
+        for y in range(rows):
+            if cells[y][x]:
+                heights[x] = rows - y
+                break
+    return heights
+
+
+def count_holes(cells, heights):
+    return sum(1 for x in range(cols)
+               for y in range(rows - heights[x], rows) if not cells[y][x])
+
+
+def default_heuristic(cells, cleared):
+    heights = column_heights(cells)
+    bumpiness = sum(abs(a - b) for a, b in zip(heights, heights[1:]))
+    return (height_weight * sum(heights)
+            + lines_weight * cleared
+            + holes_weight * count_holes(cells, heights)
+            + bumpiness_weight * bumpiness)
+
+
+class Placement(object):
+    __slots__ = ('piece', 'x', 'y', 'path', 'cells', 'cleared', 'score')
+
+    def __init__(self, piece, x, y, path, cells, cleared, score):
+        self.piece = piece
+        self.x = x
+        self.y = y
+        self.path = path
+        self.cells = cells
+        self.cleared = cleared
+        self.score = score
+
+    def __repr__(self):
+        return "Placement(rotation=%d, x=%d, y=%d, score=%.2f)" % (
+            self.piece.rotation, self.x, self.y, self.score)
+
+
+def footprint(piece, x, y):
+    # The board cells a placement covers; the same from any start.
+    return frozenset((x + cx, y + cy) for cx, cy in piece.cells)
+
+
+def reachable(cells, piece, x, y):
+    # Map every resting state reachable from (piece, x, y) to the shortest
+    # list of inputs that gets there.  Collision results are memoized per
+    # rotation since the search revisits the same offsets many times.
+    rotations = piece_table[piece.kind]
+    free = [{} for _ in rotations]
+
+    def is_free(rotation, x, y):
+        memo = free[rotation]
+        result = memo.get((x, y))
+        if result is None:
+            result = memo[(x, y)] = not board.check_collision(
+                cells, rotations[rotation], (x, y))
+        return result
+
+    start = (piece.rotation, x, y)
+    parents = {start: None}
+    queue = deque([start])
+    resting = []
+    while queue:
+        state = queue.popleft()
+        rotation, x, y = state
+        width = rotations[rotation].width
+        steps = []
+        if x > 0:
+            steps.append(((rotation, x - 1, y), ('move', -1)))
+        if x < cols - width:
+            steps.append(((rotation, x + 1, y), ('move', +1)))
+        steps.append((((rotation + 1) % 4, x, y), ('rotate',)))
+        for next_state, action in steps:
+            if next_state not in parents and is_free(*next_state):
+                parents[next_state] = (state, action)
+                queue.append(next_state)
+        below = (rotation, x, y + 1)
+        if is_free(*below):
+            if below not in parents:
+                parents[below] = (state, ('soft_drop',))
+                queue.append(below)
+        else:
+            resting.append(state)
+
+    paths = {}
+    for state in resting:
+        path = []
+        node = state
+        while parents[node] is not None:
+            node, action = parents[node]
+            path.append(action)
+        path.reverse()
+        paths[state] = path
+    return paths
+
+
+def placements(cells, piece, x, y, heuristic=default_heuristic):
+    # All distinct final placements, best first.  Rotations that cover the
+    # same cells (e.g. the O piece) are merged, keeping the shorter path.
+    found = {}
+    for (rotation, px, py), path in reachable(cells, piece, x, y).items():
+        rotated = piece_table[piece.kind][rotation]
+        key = footprint(rotated, px, py)
+        if key in found and len(found[key].path) <= len(path):
+            continue
+        after = [row[:] for row in cells]
+        after = board.join_matrixes(after, rotated, (px, py + 1))
+        after, cleared = board.clear_rows(after)
+        found[key] = Placement(rotated, px, py, path, after, cleared,
+                               heuristic(after, cleared))
+    return sorted(found.values(), key=lambda placement: -placement.score)
+
+
+def lookahead_scores(cells, kind, rotation, x, y, next_kind, heuristic):
+    # Score each placement of the current stone by the best placement of
+    # the next stone on the board it leaves.  Runs in a worker process.
+    piece = piece_table[kind][rotation]
+    next_piece = piece_table[next_kind][0]
+    next_x = int(cols / 2 - next_piece.width/2)
+    scores = []
+    for placement in placements(cells, piece, x, y, heuristic):
+        if board.check_collision(placement.cells, next_piece, (next_x, 0)):
+            scores.append(float('-inf'))
+            continue
+        follow = placements(placement.cells, next_piece, next_x, 0, heuristic)
+        best = follow[0].score if follow else float('-inf')
+        scores.append(best + lines_weight * placement.cleared)
+    return scores
+
+
+def position_key(game):
+    # Everything the suggestions and their input paths depend on.
+    stone = game.stone
+    return (tuple(map(tuple, game.cells())), stone.kind, stone.rotation,
+            game.stone_x, game.stone_y, game.next_stone.kind)
+
+
+def search_key(game):
+    # What the lookahead scores depend on: not where the stone is on its
+    # way down, so a gravity step keeps them.
+    stone = game.stone
+    return (tuple(map(tuple, game.cells())), stone.kind, stone.rotation,
+            game.next_stone.kind)
+
+
+class Assistant(object):
+    def __init__(self, top_k=3, heuristic=default_heuristic, lookahead_workers=0):
+        self.top_k = top_k
+        self.heuristic = heuristic
+        self.key = None
+        self.ranked = []
+        self.suggestions = []
+        self.pool = (ProcessPoolExecutor(lookahead_workers)
+                     if lookahead_workers else None)
+        self.pending = None
+        # Lookahead scores by footprint for search_key, once finished.
+        self.search = None
+        self.scores = None
+
+    def update(self, game):
+        # Recompute the suggestions when the board or the stone changed;
+        # returns True when they did.
+        if game.gameover:
+            changed = bool(self.suggestions)
+            self.key, self.ranked, self.suggestions = None, [], []
+            self.search = self.scores = None
+            return changed
+        cells = [row[:] for row in game.cells()]
+        stone = game.stone
+        key = position_key(game)
+        changed = False
+        if key != self.key:
+            self.key = key
+            self.ranked = placements(cells, stone, game.stone_x, game.stone_y,
+                                     self.heuristic)
+            search = search_key(game)
+            if search != self.search:
+                # A new stone or board: nothing shown so far carries over.
+                self.search, self.scores = search, None
+                self.suggestions = []
+                if self.pool is not None:
+                    if self.pending is not None:
+                        self.pending[2].cancel()
+                    self.pending = (search, self.ranked, self.pool.submit(
+                        lookahead_scores, cells, stone.kind, stone.rotation,
+                        game.stone_x, game.stone_y, game.next_stone.kind,
+                        self.heuristic))
+            self.suggestions = self.rank()
+            changed = True
+        return self.poll() or changed
+
+    def rank(self):
+        # The top placements from the current position: by lookahead score
+        # once known, else in the order already shown, then greedily.  The
+        # placements are matched by footprint, so a button keeps offering
+        # the same placement while the stone falls.
+        ranked = self.ranked
+        if self.scores is not None:
+            scores = self.scores
+            ranked = sorted(ranked, key=lambda placement: -scores.get(
+                footprint(placement.piece, placement.x, placement.y), float('-inf')))
+        elif self.suggestions:
+            shown = {footprint(placement.piece, placement.x, placement.y): i
+                     for i, placement in enumerate(self.suggestions)}
+            ranked = sorted(ranked, key=lambda placement: shown.get(
+                footprint(placement.piece, placement.x, placement.y), len(shown)))
+        return ranked[:self.top_k]
+
+    def poll(self):
+        # Adopt finished lookahead results for the current stone.
+        if self.pending is None or not self.pending[2].done():
+            return False
+        search, ranked, future = self.pending
+        self.pending = None
+        if search != self.search or future.cancelled():
+            return False
+        self.scores = {footprint(placement.piece, placement.x, placement.y): score
+                       for placement, score in zip(ranked, future.result())}
+        self.suggestions = self.rank()
+        return True
+
+    def apply(self, game, index):
+        if index >= len(self.suggestions) or game.gameover or game.paused:
+            return
+        # The paths only lead to the placements from the position they
+        # were found for; after a move or a gravity step they would put
+        # the stone somewhere else.
+        if position_key(game) != self.key:
+            return
+        for action in self.suggestions[index].path:
+            getattr(game, action[0])(*action[1:])
+        game.hard_drop()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
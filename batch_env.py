@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Batched simulator for tuning auto-play and difficulty curves.
+#
+# BatchTetris runs N independent games with the same rules as
+# engine.GameState, but holds all boards in one NumPy array of shape
+# (N, rows + 1, cols) and applies one action per board per step with
+# array operations only; there is no Python loop over boards.  Boards
+# that reach game over are frozen until reset.  Requires numpy, which
+# the game itself does not need.
+#
+#   env = BatchTetris(1024, seed=0)
+#   boards = env.reset()
+#   boards, rewards, gameover = env.step(actions)
+
+import numpy as np
+
+from board import cols, rows
+from engine import linescores
+from pieces import piece_table
+
+NOOP, LEFT, RIGHT, ROTATE, SOFT_DROP, HARD_DROP, TICK = range(7)
+actions = ('noop', 'left', 'right', 'rotate', 'soft_drop', 'hard_drop', 'tick')
+
+# Piece geometry from the scalar piece table, indexed [kind, rotation].
+# Every piece has exactly four cells.
+piece_dx = np.array([[[cx for cx, cy in piece.cells] for piece in rotations]
+                     for rotations in piece_table], dtype=np.int64)
+piece_dy = np.array([[[cy for cx, cy in piece.cells] for piece in rotations]
+                     for rotations in piece_table], dtype=np.int64)
+piece_width = np.array([[piece.width for piece in rotations]
+                        for rotations in piece_table], dtype=np.int64)
+piece_color = np.array([rotations[0].color for rotations in piece_table],
+                       dtype=np.uint8)
+spawn_x = np.array([int(cols / 2 - rotations[0].width/2)
+                    for rotations in piece_table], dtype=np.int64)
+line_scores = np.array(linescores, dtype=np.int64)
+
+
+class BatchTetris(object):
+    def __init__(self, n, seed=None):
+        self.n = n
+        self.rng = np.random.default_rng(seed)
+        self.boards = np.zeros((n, rows + 1, cols), dtype=np.uint8)
+        self.kind = np.zeros(n, dtype=np.int64)
+        self.rotation = np.zeros(n, dtype=np.int64)
+        self.x = np.zeros(n, dtype=np.int64)
+        self.y = np.zeros(n, dtype=np.int64)
+        self.next_kind = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.lines = np.zeros(n, dtype=np.int64)
+        self.level = np.ones(n, dtype=np.int64)
+        self.gameover = np.zeros(n, dtype=bool)
+        self.reset()
+
+    def draw_pieces(self, count):
+        return self.rng.integers(0, len(piece_table), size=count)
+
+    def reset(self, mask=None):
+        if mask is None:
+            mask = np.ones(self.n, dtype=bool)
+        count = int(mask.sum())
+        self.boards[mask] = 0
+        self.boards[mask, rows] = 1
+        self.next_kind[mask] = self.draw_pieces(count)
+        self.score[mask] = 0
+        self.lines[mask] = 0
+        self.level[mask] = 1
+        self.gameover[mask] = False
+        self.new_stone(mask)
+        return self.boards
+
+    def collides(self, mask, x, y, rotation):
+        # Collision of each masked board's stone at (x, y) in the given
+        # rotation; cells past the right wall or the floor collide.
+        index = np.flatnonzero(mask)
+        kind = self.kind[index]
+        cx = x[index, None] + piece_dx[kind, rotation[index]]
+        cy = y[index, None] + piece_dy[kind, rotation[index]]
+        outside = (cx >= cols) | (cy > rows)
+        cells = self.boards[index[:, None],
+                            np.minimum(cy, rows),
+                            np.minimum(cx, cols - 1)]
+        result = np.zeros(self.n, dtype=bool)
+        result[index] = (outside | (cells != 0)).any(axis=1)
+        return result
+
+    def new_stone(self, mask):
+        self.kind[mask] = self.next_kind[mask]
+        self.next_kind[mask] = self.draw_pieces(int(mask.sum()))
+        self.rotation[mask] = 0
+        self.x[mask] = spawn_x[self.kind[mask]]
+        self.y[mask] = 0
+        self.gameover |= self.collides(mask, self.x, self.y, self.rotation)
+
+    def move(self, mask, delta_x):
+        width = piece_width[self.kind, self.rotation]
+        new_x = np.clip(self.x + delta_x, 0, cols - width)
+        ok = mask & ~self.collides(mask, new_x, self.y, self.rotation)
+        self.x[ok] = new_x[ok]
+
+    def rotate(self, mask):
+        new_rotation = (self.rotation + 1) % 4
+        ok = mask & ~self.collides(mask, self.x, self.y, new_rotation)
+        self.rotation[ok] = new_rotation[ok]
+
+    def drop(self, mask, manual):
+        if manual:
+            self.score[mask] += 1
+        self.y[mask] += 1
+        locked = self.collides(mask, self.x, self.y, self.rotation)
+        if locked.any():
+            self.lock(locked)
+        return locked
+
+    def lock(self, mask):
+        index = np.flatnonzero(mask)
+        kind = self.kind[index]
+        cx = self.x[index, None] + piece_dx[kind, self.rotation[index]]
+        cy = self.y[index, None] + piece_dy[kind, self.rotation[index]] - 1
+        self.boards[index[:, None], cy, cx] = piece_color[kind, None]
+        self.new_stone(mask)
+
+        # Clear full rows in one pass: a stable sort moves full rows to the
+        # top while keeping the others in order, then they are emptied.
+        field = self.boards[index, :rows]
+        full = (field != 0).all(axis=2)
+        cleared = full.sum(axis=1)
+        if cleared.any():
+            order = np.argsort(~full, axis=1, kind='stable')
+            field = np.take_along_axis(field, order[:, :, None], axis=1)
+            field[np.arange(rows)[None, :] < cleared[:, None]] = 0
+            self.boards[index, :rows] = field
+
+        self.lines[index] += cleared
+        self.score[index] += line_scores[cleared] * self.level[index]
+        self.level[index] += self.lines[index] >= self.level[index] * 6
+
+    def hard_drop(self, mask):
+        falling = mask.copy()
+        while falling.any():
+            falling &= ~self.drop(falling, True)
+
+    def step(self, action):
+        # Apply one action per board; returns the boards, the score gained
+        # this step and the game-over mask.
+        action = np.asarray(action)
+        score = self.score.copy()
+        live = ~self.gameover
+        self.move(live & (action == LEFT), -1)
+        self.move(live & (action == RIGHT), +1)
+        self.rotate(live & (action == ROTATE))
+        self.drop(live & (action == SOFT_DROP), True)
+        self.hard_drop(live & (action == HARD_DROP))
+        self.drop(live & (action == TICK), False)
+        return self.boards, self.score - score, self.gameover
+
+    @property
+    def gravity_delay(self):
+        return np.maximum(100, 1000-50*(self.level-1))
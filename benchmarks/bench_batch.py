@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Benchmark for the batched simulator.
+#
+# Runs BatchTetris with random actions and reports board-steps per
+# second.  tests/test_batch_env.py checks it against engine.GameState.
+#
+#   python benchmarks/bench_batch.py [--boards N] [--steps N]
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_env import (HARD_DROP, LEFT, NOOP, RIGHT, ROTATE, SOFT_DROP,  # noqa: E402
+                       TICK, BatchTetris)
+
+
+def random_actions(rng, n):
+    # Weighted towards movement so stacks get ragged and lines clear.
+    return rng.choice([NOOP, LEFT, RIGHT, ROTATE, SOFT_DROP, HARD_DROP, TICK],
+                      size=n, p=[0.05, 0.2, 0.2, 0.2, 0.1, 0.1, 0.15])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the batched simulator")
+    parser.add_argument('--boards', type=int, default=4096)
+    parser.add_argument('--steps', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    env = BatchTetris(args.boards, seed=args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    plan = [random_actions(rng, args.boards) for _ in range(args.steps)]
+    start = time.perf_counter()
+    for action in plan:
+        env.step(action)
+        if env.gameover.any():
+            env.reset(env.gameover)
+    elapsed = time.perf_counter() - start
+    print("%d boards x %d steps: %.2f s, %.0f board-steps/s"
+          % (args.boards, args.steps, elapsed, args.boards * args.steps / elapsed))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
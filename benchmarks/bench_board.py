@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Microbenchmark for the board backends.
+#
+# Plays the same seeded random games on every backend, stepping pieces
+# down one row at a time exactly like TetrisApp.drop does, and reports
+# the time spent per backend.  The final boards are compared cell by
+# cell so a speedup never comes at the cost of diverging rules.
+#
+#   python benchmarks/bench_board.py [--games N] [--pieces N]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from board import BACKENDS, cols, get_backend, rows  # noqa: E402
+from pieces import Piece, piece_table  # noqa: E402
+
+
+def play(backend, seed, pieces):
+    rng = random.Random(seed)
+    board = backend.new_board()
+    lines = 0
+    for _ in range(pieces):
+        stone = piece_table[rng.randrange(len(piece_table))][rng.randrange(4)]
+        x = rng.randrange(cols - stone.width + 1)
+        if backend.check_collision(board, stone, (x, 0)):
+            board = backend.new_board()
+            continue
+        y = 0
+        while True:
+            for dx in (-1, 1):
+                backend.check_collision(board, stone, (x + dx, y))
+            y += 1
+            if backend.check_collision(board, stone, (x, y)):
+                board = backend.join_matrixes(board, stone, (x, y))
+                board, cleared = backend.clear_rows(board)
+                lines += cleared
+                break
+    return [row[:] for row in backend.cells(board)], lines
+
+
+def time_collisions(backend, repeat):
+    # Collision checks against a half-filled board at every legal offset,
+    # the innermost operation of move, rotate and drop.
+    board = backend.new_board()
+    dot = Piece(0, 0, [[1]])
+    for y in range(rows // 2, rows):
+        for x in range(cols):
+            if (x + y) % 3:
+                board = backend.join_matrixes(board, dot, (x, y + 1))
+    offsets = [(piece, (x, y)) for rotations in piece_table
+               for piece in rotations[:2]
+               for x in range(cols - piece.width + 1)
+               for y in range(rows - piece.height + 1)]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for piece, offset in offsets:
+            backend.check_collision(board, piece, offset)
+    return (time.perf_counter() - start) / (repeat * len(offsets))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare board backends")
+    parser.add_argument('--games', type=int, default=20)
+    parser.add_argument('--pieces', type=int, default=500)
+    args = parser.parse_args()
+
+    results = {}
+    for name in BACKENDS:
+        backend = get_backend(name)
+        start = time.perf_counter()
+        outcome = [play(backend, seed, args.pieces) for seed in range(args.games)]
+        elapsed = time.perf_counter() - start
+        results[name] = (elapsed, outcome)
+        per_check = time_collisions(backend, 20)
+        print("%-9s %8.3f s  %8.1f us/piece  %6.3f us/collision check"
+              % (name, elapsed, elapsed / (args.games * args.pieces) * 1e6,
+                 per_check * 1e6))
+
+    reference = results[BACKENDS[0]][1]
+    for name in BACKENDS[1:]:
+        if results[name][1] != reference:
+            print("%s diverges from %s" % (name, BACKENDS[0]))
+            return 1
+        print("%s speedup over %s: %.2fx"
+              % (name, BACKENDS[0], results[BACKENDS[0]][0] / results[name][0]))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Session video capture benchmark.
+#
+# Runs the game under the SDL dummy video driver for a few seconds while
+# a thread moves the pointer in circles at 120 Hz, so every frame is
+# redrawn, first without capture and then capturing to each available
+# format (raw frames, PNG sequence and, when ffmpeg is installed, MP4).
+# Reports the frame rate the game kept up, its frame time percentiles,
+# the capture's main-thread cost per captured frame, and how many frames
+# were captured, written and dropped.  Each run is a separate process.
+#
+#   python benchmarks/bench_capture.py [--seconds S] [--fps N] [--scale F]
+
+import argparse
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(args):
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+    sys.path.insert(0, root)
+    import pygame
+    import tetris
+
+    app = tetris.TetrisApp(seed=1, profile=True, capture=args.output,
+                           capture_fps=args.fps, capture_scale=args.scale)
+
+    def move_pointer():
+        start = time.perf_counter()
+        step = 0
+        while time.perf_counter() - start < args.seconds:
+            angle = step / 20.0
+            step += 1
+            pos = (int(app.width / 2 + 200 * math.cos(angle)),
+                   int(app.height / 2 + 200 * math.sin(angle)))
+            pygame.event.post(pygame.event.Event(pygame.MOUSEMOTION, pos=pos,
+                                                 rel=(0, 0), buttons=(0, 0, 0)))
+            time.sleep(1 / 120.0)
+        pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+    threading.Thread(target=move_pointer, daemon=True).start()
+    start = time.perf_counter()
+    try:
+        app.run()
+    except SystemExit:
+        pass
+    elapsed = time.perf_counter() - start
+    result = dict(app.profiler.stats(), fps=app.profiler.rendered / elapsed)
+    capture = app.capture
+    if capture is not None:
+        overhead, overhead_p99 = capture.overhead_ms()
+        result.update(captured=capture.captured, written=capture.written,
+                      dropped=capture.dropped, overhead=overhead,
+                      overhead_p99=overhead_p99)
+    print("result", json.dumps(result))
+
+
+def size_of(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cost of session capture")
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--fps', type=int, default=30, help="capture frame rate")
+    parser.add_argument('--scale', type=float, default=1.0, help="capture scale")
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return 0
+
+    outputs = [('none', None), ('raw', 'frames.raw'), ('png', 'frames')]
+    if shutil.which('ffmpeg'):
+        outputs.append(('mp4', 'frames.mp4'))
+    print("%-5s %6s %8s %8s %10s %10s %9s %8s %8s %9s" % (
+        "", "fps", "p50 ms", "p99 ms", "cost ms", "cost p99", "captured",
+        "written", "dropped", "MB"))
+    with tempfile.TemporaryDirectory() as directory:
+        for name, output in outputs:
+            command = [sys.executable, os.path.abspath(__file__), '--child',
+                       '--seconds', str(args.seconds), '--fps', str(args.fps),
+                       '--scale', str(args.scale)]
+            if output is not None:
+                output = os.path.join(directory, output)
+                command += ['--output', output]
+            lines = subprocess.run(command, capture_output=True, text=True).stdout.splitlines()
+            results = [line[len("result "):] for line in lines if line.startswith("result ")]
+            if not results:
+                print("%-5s failed" % name)
+                continue
+            result = json.loads(results[0])
+            line = "%-5s %6.0f %8.2f %8.2f" % (name, result['fps'], result['p50'], result['p99'])
+            if output is not None:
+                line += " %10.2f %10.2f %9d %8d %8d %9.1f" % (
+                    result['overhead'], result['overhead_p99'], result['captured'],
+                    result['written'], result['dropped'], size_of(output) / 1e6)
+            print(line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Swipe detection and filtering benchmark for the pointer pipeline.
+#
+# Generates swipes across the swipe area at increasing speeds, sampled
+# at a device rate, and counts how many are recognised when the pointer
+# is only looked at once per frame (the old frame-snapshot detection)
+# and when the pipeline sees every sample.  Also reports how much the
+# One Euro filter reduces gaze-like jitter at rest and how many samples
+# per second the pipeline processes.  --check fails unless the pipeline
+# recognises every swipe.
+#
+#   python benchmarks/bench_pointer.py [--rate HZ] [--fps N] [--check]
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import pygame
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pointer import OneEuroFilter, PointerPipeline, SwipeDetector, TraceSource  # noqa: E402
+
+cell_size = 32
+area = pygame.Rect(cell_size * 10, cell_size * 10, cell_size * 6, cell_size * 6)
+min_distance = cell_size * 5
+directions = {'right': (1, 0), 'left': (-1, 0), 'down': (0, 1), 'up': (0, -1)}
+
+
+def swipe_trace(direction, speed, rate, rng):
+    # Straight line through the area at speed px/s, sampled at rate Hz
+    # with a random phase, starting and ending 2 cells outside it.
+    dx, dy = directions[direction]
+    offset = rng.randrange(-area.width // 3, area.width // 3)
+    cx, cy = area.center
+    length = area.width + 4 * cell_size
+    start = (cx - dx * length // 2 + dy * offset, cy - dy * length // 2 + dx * offset)
+    duration = length / speed * 1000
+    step = 1000.0 / rate
+    t = rng.random() * step
+    samples = []
+    while t <= duration + step:
+        f = min(t / duration, 1.0)
+        samples.append((t, int(start[0] + dx * f * length), int(start[1] + dy * f * length)))
+        t += step
+    return samples
+
+
+def snapshot_swipes(samples, fps):
+    # The detection the game used before: the latest pointer position at
+    # each frame, compared against the area.
+    frame = 1000.0 / fps
+    enter = leave = None
+    found = []
+    index = 0
+    t = 0.0
+    while index < len(samples):
+        while index + 1 < len(samples) and samples[index + 1][0] <= t:
+            index += 1
+        pos = samples[index][1:]
+        if enter is None and area.collidepoint(pos):
+            enter = pos
+        elif leave is None and enter is not None and not area.collidepoint(pos):
+            leave = pos
+        if enter is not None and leave is not None:
+            dx, dy = enter[0] - leave[0], enter[1] - leave[1]
+            if dx > min_distance:
+                found.append('left')
+            elif dx < -min_distance:
+                found.append('right')
+            elif dy > min_distance:
+                found.append('up')
+            elif dy < -min_distance:
+                found.append('down')
+            enter = leave = None
+        if index == len(samples) - 1:
+            break
+        t += frame
+    return found
+
+
+def stream_swipes(samples, smoothing=None):
+    pipeline = PointerPipeline(TraceSource(samples), smoothing,
+                               SwipeDetector(area, min_distance))
+    # The trace starts at the first poll; the second delivers the rest.
+    _, swipes = pipeline.update(0)
+    swipes += pipeline.update(samples[-1][0] - samples[0][0] + 1)[1]
+    return [direction for _, direction in swipes]
+
+
+def jitter(rate, seconds, sigma, rng):
+    # A gaze resting on one point: Gaussian noise around it.
+    count = int(rate * seconds)
+    return [(i * 1000.0 / rate, int(round(rng.gauss(400, sigma))),
+             int(round(rng.gauss(300, sigma)))) for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pointer pipeline")
+    parser.add_argument('--rate', type=int, default=250, help="device sample rate in Hz")
+    parser.add_argument('--fps', type=int, default=60, help="frame rate of the snapshot detection")
+    parser.add_argument('--swipes', type=int, default=200, help="swipes per speed")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--check', action='store_true')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    failures = 0
+    print("%10s  %14s  %14s" % ("px/s", "per frame", "all samples"))
+    for speed in (500, 1000, 2000, 4000, 8000, 16000, 32000):
+        snapshot = stream = 0
+        for _ in range(args.swipes):
+            direction = rng.choice(list(directions))
+            samples = swipe_trace(direction, speed, args.rate, rng)
+            snapshot += snapshot_swipes(samples, args.fps) == [direction]
+            stream += stream_swipes(samples) == [direction]
+        failures += args.swipes - stream
+        print("%10d  %13.1f%%  %13.1f%%" % (speed, 100.0 * snapshot / args.swipes,
+                                            100.0 * stream / args.swipes))
+
+    samples = jitter(args.rate, 5, 6, rng)
+    one_euro = OneEuroFilter()
+    smoothed = [one_euro(t, x, y) for t, x, y in samples]
+    print("jitter at rest: %.2f px raw, %.2f px with One Euro"
+          % (statistics.pstdev([x for _, x, _ in samples]),
+             statistics.pstdev([x for x, _ in smoothed[args.rate:]])))
+
+    samples = swipe_trace('right', 2000, args.rate, rng)
+    samples = [(i, x, y) for i, (_, x, y) in enumerate(samples * 200)]
+    start = time.perf_counter()
+    stream_swipes(samples, OneEuroFilter())
+    elapsed = time.perf_counter() - start
+    print("pipeline with One Euro: %.0f samples/s" % (len(samples) / elapsed))
+
+    if args.check and failures:
+        print("%d swipes missed or misclassified by the pipeline" % failures)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
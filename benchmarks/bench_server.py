@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Load test for server.py.
+#
+# Starts a server on a free local port (unless --address names a running
+# one), opens --sessions sessions spread over --connections connections
+# and plays random inputs in every session at --rate actions per second
+# for --seconds.  Each update is applied to a mirror of its session, and
+# input latency is the time from sending an action until the first
+# update that acknowledges it.  At the end every session is paused and
+# watched from a fresh connection; the keyframe the watcher gets must
+# match the mirror built from deltas.  Reports input latency, the
+# server's own tick latency, updates and bytes per second against what
+# full boards would have cost, and the server's CPU use.  --check fails
+# on any mismatch, error or unacknowledged action.
+#
+#   python benchmarks/bench_server.py [--sessions N] [--connections N]
+#                                     [--rate HZ] [--seconds S] [--check]
+
+import argparse
+import asyncio
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from board import cols, rows  # noqa: E402
+from replay import (HARD_DROP, MOVE_LEFT, MOVE_RIGHT, ROTATE, SOFT_DROP,  # noqa: E402
+                    START_GAME, TOGGLE_PAUSE)
+from server import (ACTION, ERROR, GAMEOVER, NEW, STATS, UPDATE, WATCH,  # noqa: E402
+                    WELCOME, action_format, frame, new_format, read_message,
+                    read_update, row_size, stats_format, update_format,
+                    watch_format, welcome_format)
+
+play_codes = (MOVE_LEFT, MOVE_RIGHT, ROTATE, SOFT_DROP, HARD_DROP)
+full_update_size = 2 + update_format.size + rows * row_size
+
+
+class Totals(object):
+    def __init__(self):
+        self.bytes = 0
+        self.full_bytes = 0
+        self.updates = 0
+        self.errors = 0
+        self.latency = []
+
+
+class Mirror(object):
+    # A session as rebuilt from the updates its player receives.
+    def __init__(self):
+        self.rows = [bytes(cols)] * rows
+        self.fields = None
+        self.acked = asyncio.Event()
+        # (seq, send time) of actions not acknowledged yet.
+        self.pending = deque()
+        self.seq = 0
+
+    def apply(self, fields, changed, now, totals):
+        self.fields = fields
+        for y, colors in changed:
+            self.rows[y] = colors
+        ack = fields[3]
+        pending = self.pending
+        while pending and pending[0][0] <= ack:
+            totals.latency.append(now - pending.popleft()[1])
+        if not pending:
+            self.acked.set()
+
+    @property
+    def gameover(self):
+        return self.fields is not None and self.fields[7] & GAMEOVER
+
+    def state(self):
+        # Everything a keyframe must agree on: the update header from the
+        # score on, without flags or row count, and the rows.
+        return self.fields[4:7] + self.fields[8:13], self.rows
+
+
+class Connection(object):
+    def __init__(self, reader, writer, totals):
+        self.reader = reader
+        self.writer = writer
+        self.totals = totals
+        self.mirrors = {}
+        self.welcomes = asyncio.Queue()
+        self.stats = asyncio.Queue()
+        self.task = asyncio.ensure_future(self.receive())
+
+    async def receive(self):
+        totals = self.totals
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                body = await read_message(self.reader)
+                totals.bytes += 2 + len(body)
+                kind = body[0]
+                if kind == UPDATE:
+                    fields, changed = read_update(body)
+                    totals.updates += 1
+                    totals.full_bytes += full_update_size
+                    self.mirrors[fields[1]].apply(fields, changed, loop.time(), totals)
+                elif kind == WELCOME:
+                    session = welcome_format.unpack(body)[1]
+                    self.mirrors[session] = Mirror()
+                    self.welcomes.put_nowait(session)
+                elif kind == STATS:
+                    self.stats.put_nowait(stats_format.unpack(body))
+                elif kind == ERROR:
+                    totals.errors += 1
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    def send(self, session, code):
+        mirror = self.mirrors[session]
+        mirror.seq += 1
+        mirror.pending.append((mirror.seq, asyncio.get_running_loop().time()))
+        mirror.acked.clear()
+        self.writer.write(frame(action_format.pack(ACTION, session, mirror.seq, code)))
+
+    async def new_session(self, seed):
+        self.writer.write(frame(new_format.pack(NEW, 1, seed)))
+        return await self.welcomes.get()
+
+    def close(self):
+        self.task.cancel()
+        self.writer.close()
+
+
+async def open_connection(address, totals):
+    host, _, port = address.rpartition(':')
+    if host and port.isdigit():
+        reader, writer = await asyncio.open_connection(host, int(port))
+        writer.transport.get_extra_info('socket').setsockopt(
+            socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    else:
+        reader, writer = await asyncio.open_unix_connection(address)
+    return Connection(reader, writer, totals)
+
+
+async def play(connection, session, rate, rng, stop_at):
+    loop = asyncio.get_running_loop()
+    mirror = connection.mirrors[session]
+    while True:
+        await asyncio.sleep(rng.expovariate(rate))
+        if loop.time() >= stop_at:
+            return
+        connection.send(session, START_GAME if mirror.gameover else rng.choice(play_codes))
+
+
+def percentiles(values):
+    ordered = sorted(values) or [0.0]
+    return tuple(ordered[min(len(ordered) - 1, int(f * len(ordered)))]
+                 for f in (0.5, 0.95, 0.99)) + (ordered[-1],)
+
+
+async def run(args):
+    totals = Totals()
+    connections = [await open_connection(args.address, totals)
+                   for _ in range(args.connections)]
+    sessions = []
+    for i in range(args.sessions):
+        connection = connections[i % len(connections)]
+        sessions.append((connection, await connection.new_session(args.seed + i)))
+    # Wait for the first keyframes before timing anything.
+    while any(connection.mirrors[session].fields is None for connection, session in sessions):
+        await asyncio.sleep(0.01)
+
+    loop = asyncio.get_running_loop()
+    totals.bytes = totals.full_bytes = totals.updates = 0
+    start = loop.time()
+    rng = random.Random(args.seed)
+    await asyncio.gather(*[play(connection, session, args.rate,
+                                random.Random(rng.random()), start + args.seconds)
+                           for connection, session in sessions])
+    # Let the last actions be acknowledged.
+    await asyncio.wait([asyncio.ensure_future(connection.mirrors[session].acked.wait())
+                        for connection, session in sessions], timeout=5)
+    elapsed = loop.time() - start
+    received, full, updates = totals.bytes, totals.full_bytes, totals.updates
+    unacked = sum(len(connection.mirrors[session].pending) for connection, session in sessions)
+
+    connections[0].writer.write(frame(bytes((STATS,))))
+    stats = await asyncio.wait_for(connections[0].stats.get(), 5)
+
+    # Freeze every session, then compare a watcher's keyframe with the
+    # mirror the deltas built.
+    for connection, session in sessions:
+        connection.send(session, TOGGLE_PAUSE)
+    await asyncio.wait([asyncio.ensure_future(connection.mirrors[session].acked.wait())
+                        for connection, session in sessions], timeout=5)
+    watcher = await open_connection(args.address, totals)
+    mismatched = 0
+    for connection, session in sessions:
+        watcher.writer.write(frame(watch_format.pack(WATCH, session)))
+        await watcher.welcomes.get()
+        mirror = watcher.mirrors[session]
+        while mirror.fields is None:
+            await asyncio.sleep(0.005)
+        mismatched += mirror.state() != connection.mirrors[session].state()
+    watcher.close()
+    for connection in connections:
+        connection.close()
+
+    latency = [ms * 1e3 for ms in totals.latency]
+    print("%d sessions over %d connections, %.1f actions/s each, %.1f s"
+          % (args.sessions, args.connections, args.rate, elapsed))
+    print("input latency ms:       p50 %.2f  p95 %.2f  p99 %.2f  max %.2f  (%d actions)"
+          % (percentiles(latency) + (len(latency),)))
+    print("server tick latency ms: p50 %.2f  p99 %.2f  max %.2f  (%d ticks)"
+          % (stats[4], stats[5], stats[6], stats[1]))
+    print("updates: %.0f/s, %.0f B each, %.1f KB/s received; full boards would be %.1f KB/s (%.1fx)"
+          % (updates / elapsed, received / max(updates, 1), received / elapsed / 1e3,
+             full / elapsed / 1e3, full / max(received, 1)))
+    print("keyframes matching the mirrored state: %d of %d" % (len(sessions) - mismatched,
+                                                                len(sessions)))
+    if totals.errors or unacked:
+        print("%d errors, %d actions never acknowledged" % (totals.errors, unacked))
+    return mismatched == 0 and not totals.errors and not unacked
+
+
+def free_address():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return '127.0.0.1:%d' % sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the session server")
+    parser.add_argument('--address', default=None,
+                        help="use a running server instead of starting one")
+    parser.add_argument('--sessions', type=int, default=300)
+    parser.add_argument('--connections', type=int, default=10)
+    parser.add_argument('--rate', type=float, default=5.0,
+                        help="actions per second per session")
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--check', action='store_true')
+    args = parser.parse_args()
+
+    server = None
+    if args.address is None:
+        args.address = free_address()
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(os.path.dirname(os.path.dirname(
+                os.path.abspath(__file__))), 'server.py'), '--listen', args.address],
+            stdout=subprocess.PIPE, text=True)
+        server.stdout.readline()
+        started = time.perf_counter()
+    try:
+        ok = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    if server is not None:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        print("server CPU: %.0f%% of one core"
+              % (100 * (usage.ru_utime + usage.ru_stime) / (time.perf_counter() - started)))
+    if args.check and not ok:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
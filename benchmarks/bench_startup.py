@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Time-to-first-frame benchmark.
+#
+# Launches the game repeatedly under the SDL dummy video driver and
+# measures the wall time from spawning the process until first_frame.py
+# reports its first presented frame.  By default the source tree is
+# launched with the current interpreter, with the probe imported first;
+# pass --frozen with the path of a PyInstaller build that has the probe
+# as a runtime hook (see first_frame.py) to time the bundle.
+# --imports lists the slowest imports of a source launch, which is where
+# most of the time goes: pygame pulls in numpy and pkg_resources eagerly
+# whenever they are installed.
+#
+#   python benchmarks/bench_startup.py [--runs N] [--frozen dist/tetris/tetris]
+#   python benchmarks/bench_startup.py --imports
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+here = os.path.dirname(os.path.abspath(__file__))
+root = os.path.dirname(here)
+
+# Runs tetris.py as the main script once the probe is in place.  pygame
+# is imported on its own first so --imports still lists it.
+source_launch = ("import runpy, sys; sys.path[:0] = [%r, %r]; import pygame, first_frame; "
+                 "sys.argv = [%r]; runpy.run_path(sys.argv[0], run_name='__main__')"
+                 % (here, root, os.path.join(root, 'tetris.py')))
+# What first_frame.py prints.
+marker = "first frame"
+
+
+def probe_env():
+    return dict(os.environ,
+                SDL_VIDEODRIVER='dummy',
+                SDL_AUDIODRIVER='dummy',
+                PYGAME_HIDE_SUPPORT_PROMPT='1')
+
+
+def slowest_imports(count):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', source_launch],
+        cwd=root, env=probe_env(), capture_output=True, text=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('   '):
+            imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def time_to_first_frame(command):
+    env = probe_env()
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=root, env=env,
+                               stdout=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        if line.strip() == marker:
+            elapsed = time.perf_counter() - start
+            break
+    else:
+        process.wait()
+        raise RuntimeError("%s exited with %d before drawing a frame"
+                           % (" ".join(command), process.returncode))
+    process.wait()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time to first frame")
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--frozen', metavar='PATH',
+                        help="time a frozen bundle instead of the source tree")
+    parser.add_argument('--imports', action='store_true',
+                        help="list the slowest top-level imports and exit")
+    args = parser.parse_args()
+
+    if args.imports:
+        for cumulative, name in slowest_imports(10):
+            print("%8.1f ms  %s" % (cumulative / 1e3, name))
+        return 0
+
+    if args.frozen:
+        command = [os.path.abspath(args.frozen)]
+    else:
+        command = [sys.executable, '-c', source_launch]
+
+    # The first launch warms the OS file cache and is not counted.
+    time_to_first_frame(command)
+    times = [time_to_first_frame(command) for _ in range(args.runs)]
+    print("%s: min %.0f ms  median %.0f ms  max %.0f ms over %d runs"
+          % ('frozen' if args.frozen else 'source',
+             min(times) * 1e3, statistics.median(times) * 1e3,
+             max(times) * 1e3, len(times)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
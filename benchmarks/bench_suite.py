@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Benchmark and regression suite for the engine and rendering hot paths.
+#
+# Times the board operations of every backend (collision, locking, row
+# removal and clearing, landing row) on scripted boards - empty, a tall
+# stack with holes and a four-line clear - plus piece rotation, the
+# engine's drops, full seeded games, and drawing and presenting frames
+# of the real TetrisApp under the SDL dummy video driver, both at the
+# canvas size and scaled to 4K.  Each case reports the best of several
+# runs per operation.
+#
+# Results can be saved as a baseline and later compared against it;
+# compare mode exits non-zero when any case got slower than the baseline
+# by more than the threshold.  Baselines only mean something on the
+# machine they were taken on.
+#
+#   python benchmarks/bench_suite.py [--filter TEXT] [--quick]
+#   python benchmarks/bench_suite.py --save [PATH]
+#   python benchmarks/bench_suite.py --compare [PATH] [--threshold 0.25]
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import board as list_backend  # noqa: E402
+from board import BACKENDS, cols, get_backend, rows, tetris_shapes  # noqa: E402
+from engine import GameState  # noqa: E402
+from pieces import Piece, piece_table, rotate  # noqa: E402
+
+default_baseline = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'baseline.json')
+
+dot = Piece(0, 0, [[1]])
+i_vertical = piece_table[5][1]
+
+
+def fill(backend, cells):
+    board = backend.new_board()
+    for x, y in cells:
+        board = backend.join_matrixes(board, dot, (x, y + 1))
+    return board
+
+
+def tall_stack(backend):
+    # Rows 4 and below filled except a staggered hole per row, so no row
+    # is full and every column is covered.
+    return fill(backend, [(x, y) for y in range(4, rows)
+                          for x in range(cols) if x != (y * 3) % cols])
+
+
+def four_lines(backend):
+    # The bottom four rows are full but for column 0, where a vertical I
+    # completes them all.
+    return fill(backend, [(x, y) for y in range(rows - 4, rows)
+                          for x in range(1, cols)])
+
+
+def clone(backend, board):
+    if backend is list_backend:
+        return [row[:] for row in board]
+    copy = board.__class__.__new__(board.__class__)
+    copy.masks = board.masks[:]
+    copy.colors = [row[:] for row in board.colors]
+    copy.bits = board.bits
+    copy.tops = board.tops[:]
+    return copy
+
+
+def board_cases(name):
+    backend = get_backend(name)
+    empty = backend.new_board()
+    tall = tall_stack(backend)
+    lines = four_lines(backend)
+    offsets = [(piece, (x, y)) for rotations in piece_table
+               for piece in rotations[:2]
+               for x in range(cols - piece.width + 1)
+               for y in range(rows - piece.height + 1)]
+    check = backend.check_collision
+
+    def collisions(board):
+        def run():
+            for piece, offset in offsets:
+                check(board, piece, offset)
+        return run
+
+    def lock_and_clear():
+        board = clone(backend, lines)
+        board = backend.join_matrixes(board, i_vertical, (0, rows - 3))
+        board, cleared = backend.clear_rows(board, range(rows - 4, rows))
+        assert cleared == 4
+
+    def lock_no_clear():
+        board = clone(backend, tall)
+        board = backend.join_matrixes(board, piece_table[6][0], (0, 3))
+        backend.clear_rows(board, range(2, 4))
+
+    def landing():
+        for rotations in piece_table:
+            for x in range(cols - rotations[0].width + 1):
+                backend.landing_y(tall, rotations[0], x, 0)
+
+    prefix = 'board.%s.' % name
+    return [
+        (prefix + 'collision.empty', collisions(empty), len(offsets)),
+        (prefix + 'collision.tall', collisions(tall), len(offsets)),
+        (prefix + 'lock_clear.four_lines', lock_and_clear, 1),
+        (prefix + 'lock.tall', lock_no_clear, 1),
+        (prefix + 'remove_row.tall',
+         lambda: backend.remove_row(clone(backend, tall), rows - 1), 1),
+        (prefix + 'landing_y.tall', landing, sum(
+            cols - rotations[0].width + 1 for rotations in piece_table)),
+    ]
+
+
+def rotation_cases():
+    shapes = [[list(row) for row in shape] for shape in tetris_shapes]
+    pieces = [rotations[0] for rotations in piece_table]
+
+    def rotate_shapes():
+        for shape in shapes:
+            list_backend.rotate_clockwise(shape)
+
+    def rotate_pieces():
+        for piece in pieces:
+            rotate(piece)
+
+    return [
+        ('rotate.rotate_clockwise', rotate_shapes, len(shapes)),
+        ('rotate.piece_table', rotate_pieces, len(pieces)),
+    ]
+
+
+def play_game(name, seed, pieces, soft):
+    # A seeded game: each piece gets a random rotation and column, then
+    # falls by soft drops (the per-row path of the old TetrisApp.drop) or
+    # a hard drop, with gravity ticks in between.  Returns the outcome so
+    # backends can be checked against each other.
+    game = GameState(seed, name)
+    policy = random.Random(seed)
+    outcome = []
+    for _ in range(pieces):
+        if game.gameover:
+            outcome.append(game.score)
+            game.start_game()
+        for _ in range(policy.randrange(4)):
+            game.rotate()
+        game.move(policy.randrange(-cols, cols))
+        game.tick()
+        if soft:
+            while not game.gameover and not game.soft_drop():
+                pass
+        else:
+            game.hard_drop()
+    outcome.append((game.score, game.lines, [row[:] for row in game.cells()]))
+    return outcome
+
+
+def game_cases(name, pieces=200):
+    prefix = 'game.%s.' % name
+    return [
+        (prefix + 'hard_drop', lambda: play_game(name, 1, pieces, False), pieces),
+        (prefix + 'soft_drop', lambda: play_game(name, 1, pieces, True), pieces),
+    ]
+
+
+def render_cases():
+    import pygame
+    import tetris
+    from renderer import Renderer
+
+    app = tetris.TetrisApp(seed=1)
+    game = app.game
+    game.board = tall_stack(game.backend)
+    tall = game.cells()
+    direction = [1]
+
+    # The same logical canvas presented to the display and scaled to a
+    # 4K surface, whose cost should stay close to the unscaled one.
+    renderers = [('', app.renderer),
+                 ('.2160p', Renderer(pygame.Surface((3840, 2160)).convert(),
+                                     app.default_font, app.cell_size,
+                                     tetris.colors, (app.width, app.height)))]
+    for _, renderer in renderers:
+        renderer.begin('playing', app.build_playing_layer)
+
+    def draw_matrix():
+        app.draw_matrix(tall, (0, 0))
+
+    def frame_idle(renderer):
+        def run():
+            app.renderer = renderer
+            app.draw_frame(None)
+        return run
+
+    def frame_move(renderer):
+        def run():
+            app.renderer = renderer
+            direction[0] = -direction[0]
+            game.move(direction[0])
+            app.draw_frame(None)
+        return run
+
+    def frame_full(renderer):
+        def run():
+            app.renderer = renderer
+            renderer.invalidate()
+            app.draw_frame(None)
+        return run
+
+    cases = [('render.draw_matrix.tall', draw_matrix, 1)]
+    for suffix, renderer in renderers:
+        cases += [
+            ('render.frame.idle' + suffix, frame_idle(renderer), 1),
+            ('render.frame.move' + suffix, frame_move(renderer), 1),
+            ('render.frame.full' + suffix, frame_full(renderer), 1),
+        ]
+    return cases, pygame.quit
+
+
+def measure(run, per_call, repeat):
+    timer = timeit.Timer(run)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / (number * per_call)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the hot paths")
+    parser.add_argument('--filter', default='', metavar='TEXT',
+                        help="only run cases whose name contains TEXT")
+    parser.add_argument('--quick', action='store_true',
+                        help="fewer repeats, noisier numbers")
+    parser.add_argument('--save', nargs='?', const=default_baseline, metavar='PATH',
+                        help="store the results as a baseline (default: %(const)s)")
+    parser.add_argument('--compare', nargs='?', const=default_baseline, metavar='PATH',
+                        help="fail when a case is slower than the baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown in compare mode (default: 0.25)")
+    args = parser.parse_args()
+
+    # The games must end the same on every backend before they are timed.
+    for soft in (False, True):
+        outcomes = [play_game(name, 1, 200, soft) for name in BACKENDS]
+        if any(outcome != outcomes[0] for outcome in outcomes[1:]):
+            print("board backends diverge in the scripted games")
+            return 1
+
+    cases = rotation_cases()
+    for name in BACKENDS:
+        cases += board_cases(name)
+    for name in BACKENDS:
+        cases += game_cases(name)
+    render, cleanup = render_cases()
+    cases += render
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as stream:
+            baseline = json.load(stream)['results']
+
+    repeat = 3 if args.quick else 7
+    results = {}
+    regressions = []
+    for name, run, per_call in cases:
+        if args.filter not in name:
+            continue
+        seconds = measure(run, per_call, repeat)
+        results[name] = seconds
+        line = "%-36s %10.3f us" % (name, seconds * 1e6)
+        if baseline is not None:
+            if name in baseline:
+                ratio = seconds / baseline[name]
+                line += "  %6.2fx baseline" % ratio
+                if ratio > 1 + args.threshold:
+                    line += "  REGRESSION"
+                    regressions.append(name)
+            else:
+                line += "  (new)"
+        print(line)
+    cleanup()
+
+    if args.save:
+        with open(args.save, 'w') as stream:
+            json.dump({'python': platform.python_version(),
+                       'machine': platform.machine(),
+                       'platform': platform.platform(),
+                       'results': results}, stream, indent=1, sort_keys=True)
+        print("saved %d results to %s" % (len(results), args.save))
+    if regressions:
+        print("%d case(s) slower than the baseline by more than %d%%: %s"
+              % (len(regressions), args.threshold * 100, ", ".join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# First-frame probe for bench_startup.py.
+#
+# Importing this module before the game starts wraps pygame's display
+# update calls, so the first frame the game presents prints "first frame"
+# and ends the process.  bench_startup.py imports it ahead of tetris.py
+# for a source launch; for a frozen bundle, build a probe bundle with it
+# as a PyInstaller runtime hook:
+#
+#   pyinstaller --runtime-hook benchmarks/first_frame.py ... tetris.py
+
+import os
+
+import pygame
+
+
+def probe(present):
+    def first_frame(*args):
+        present(*args)
+        print("first frame", flush=True)
+        os._exit(0)
+    return first_frame
+
+
+pygame.display.update = probe(pygame.display.update)
+pygame.display.flip = probe(pygame.display.flip)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Bitboard backend for the board rules.
+#
+# Each board row is stored as an integer with bit x set when column x is
+# occupied, so collision, locking and full-row detection cost one bitwise
+# operation per piece row instead of a Python loop over every cell.  A
+# parallel color plane keeps the per-cell color ints for rendering.
+#
+# The rows are also kept packed into a single integer (`bits`, row y at
+# bit y * stride) so that check_collision is one shift and one AND against
+# Piece.packed regardless of the piece's height.
+#
+# A skyline index, tops[x] = the topmost occupied row of column x, is kept
+# up to date as pieces lock, so the landing row of a hard drop or ghost
+# piece is computed directly instead of stepping down row by row.
+
+from board import cols, rows
+
+# Bit `cols` of every row is a permanent right wall, so a piece poking out
+# to the right collides like any other occupied cell.
+wall = 1 << cols
+empty_row = wall
+full_row = (1 << (cols + 1)) - 1
+stride = cols + 1
+
+# Solid rows packed below the floor so no offset can slip past it.
+_below_floor = sum(full_row << (y * stride) for y in range(rows + 1, rows + 5))
+
+
+class BitBoard(object):
+    __slots__ = ('masks', 'colors', 'bits', 'tops')
+
+    def __init__(self, masks, colors):
+        self.masks = masks
+        self.colors = colors
+        self.bits = pack(masks)
+        self.tops = skyline(masks)
+
+
+def pack(masks):
+    bits = _below_floor
+    for y, mask in enumerate(masks):
+        bits |= mask << (y * stride)
+    return bits
+
+
+def skyline(masks):
+    tops = [rows] * cols
+    for y in range(rows - 1, -1, -1):
+        mask = masks[y]
+        for x in range(cols):
+            if mask >> x & 1:
+                tops[x] = y
+    return tops
+
+
+def check_collision(board, piece, offset):
+    off_x, off_y = offset
+    return off_x < 0 or (board.bits >> (off_y * stride + off_x)) & piece.packed != 0
+
+
+def remove_row(board, row):
+    del board.masks[row]
+    del board.colors[row]
+    board.masks.insert(0, empty_row)
+    board.colors.insert(0, [0] * cols)
+    board.bits = pack(board.masks)
+    board.tops = skyline(board.masks)
+    return board
+
+
+def join_matrixes(board, piece, offset):
+    off_x, off_y = offset
+    board_masks = board.masks
+    for cy, mask in enumerate(piece.masks):
+        board_masks[cy + off_y - 1] |= mask << off_x
+    board.bits |= piece.packed << ((off_y - 1) * stride + off_x)
+    color = piece.color
+    board_colors = board.colors
+    tops = board.tops
+    for cx, cy in piece.cells:
+        board_colors[cy + off_y - 1][cx + off_x] = color
+        if cy + off_y - 1 < tops[cx + off_x]:
+            tops[cx + off_x] = cy + off_y - 1
+    return board
+
+
+def clear_rows(board, touched=None):
+    # Only rows in touched (by default every row) can be full; they are
+    # all removed in a single compaction pass.
+    board_masks = board.masks
+    if touched is None:
+        touched = range(rows)
+    full = {y for y in touched if board_masks[y] == full_row}
+    if not full:
+        return board, 0
+    keep = [y for y in range(rows) if y not in full]
+    board.masks = ([empty_row] * len(full)
+                   + [board_masks[y] for y in keep]
+                   + [board_masks[rows]])
+    board.colors = ([[0] * cols for _ in full]
+                    + [board.colors[y] for y in keep]
+                    + [board.colors[rows]])
+    board.bits = pack(board.masks)
+    board.tops = skyline(board.masks)
+    return board, len(full)
+
+
+def landing_y(board, piece, x, y):
+    # The row a piece falling straight down from (x, y) comes to rest in.
+    # When the piece is above the skyline in all its columns the answer
+    # follows from the column tops alone; a piece tucked under an overhang
+    # falls back to stepping.
+    tops = board.tops
+    landing = min(tops[x + cx] - 1 - bottom
+                  for cx, bottom in enumerate(piece.bottoms))
+    if landing >= y:
+        return landing
+    while not check_collision(board, piece, (x, y + 1)):
+        y += 1
+    return y
+
+
+def cells(board):
+    return board.colors
+
+
+def new_board():
+    masks = [empty_row] * rows + [full_row]
+    colors = [[0] * cols for y in range(rows)] + [[1] * cols]
+    return BitBoard(masks, colors)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Board rules shared by every frontend.
+#
+# This is the reference "list" backend: the board is a list of rows + 1
+# rows of per-cell color ints, the last row being a solid floor.  The
+# bitboard module provides the same functions over integer row masks;
+# both are interchangeable through get_backend().  Pieces are passed as
+# pieces.Piece objects.  The game plays on bitboard, which also keeps
+# the column skyline for direct landing rows; this one stays simple so
+# it can check it.
+
+import sys
+
+cols = 10
+rows = 22
+
+# Define the shapes of the single parts
+tetris_shapes = [
+    [[1, 1, 1],
+     [0, 1, 0]],
+
+    [[0, 2, 2],
+     [2, 2, 0]],
+
+    [[3, 3, 0],
+     [0, 3, 3]],
+
+    [[4, 0, 0],
+     [4, 4, 4]],
+
+    [[0, 0, 5],
+     [5, 5, 5]],
+
+    [[6, 6, 6, 6]],
+
+    [[7, 7],
+     [7, 7]]
+]
+
+
+def rotate_clockwise(shape):
+    return [
+        [shape[y][x] for y in range(len(shape))]
+        for x in range(len(shape[0]) - 1, -1, -1)
+    ]
+
+
+def check_collision(board, piece, offset):
+    off_x, off_y = offset
+    for cx, cy in piece.cells:
+        try:
+            if board[cy + off_y][cx + off_x]:
+                return True
+        except IndexError:
+            return True
+    return False
+
+
+def remove_row(board, row):
+    del board[row]
+    return [[0 for i in range(cols)]] + board
+
+
+def join_matrixes(board, piece, offset):
+    off_x, off_y = offset
+    color = piece.color
+    for cx, cy in piece.cells:
+        board[cy+off_y-1][cx+off_x] = color
+    return board
+
+
+def clear_rows(board, touched=None):
+    # Only rows in touched (by default every row) can be full; they are
+    # all removed in a single compaction pass.
+    if touched is None:
+        touched = range(len(board) - 1)
+    full = {y for y in touched if 0 not in board[y]}
+    if not full:
+        return board, 0
+    kept = [row for y, row in enumerate(board[:-1]) if y not in full]
+    return [[0 for i in range(cols)] for y in full] + kept + board[-1:], len(full)
+
+
+def landing_y(board, piece, x, y):
+    # The row a piece falling straight down from (x, y) comes to rest in.
+    while not check_collision(board, piece, (x, y + 1)):
+        y += 1
+    return y
+
+
+def cells(board):
+    return board
+
+
+def new_board():
+    board = [
+        [0 for x in range(cols)]
+        for y in range(rows)
+    ]
+    board += [[1 for x in range(cols)]]
+    return board
+
+
+BACKENDS = ('list', 'bitboard')
+
+
+def get_backend(name):
+    if name == 'list':
+        return sys.modules[__name__]
+    if name == 'bitboard':
+        import bitboard
+        return bitboard
+    raise ValueError("unknown board backend %r (choose from %s)"
+                     % (name, ", ".join(BACKENDS)))
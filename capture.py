@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Non-blocking session video capture.
+#
+# After a frame is presented, the main loop offers the frame to a
+# FrameCapture.  At most fps times a second, and only when the bounded
+# queue has room, it takes a copy of the renderer's canvas - the
+# logical-size image the display is scaled from, so a 4K display costs no
+# more than any other - puts it on the queue and returns.  A worker thread takes frames off the queue, scales them,
+# draws the pointer and hands them to a writer: a raw frame dump, a PNG
+# sequence or an ffmpeg pipe.  When the queue is full the frame is
+# dropped instead of waiting, so a slow disk or encoder never stalls the
+# game.  Frames are only drawn when something changed, so every frame
+# carries its time and the writers keep real-time spacing.
+#
+# Raw dump format, little endian:
+#   header  b'TTVF', version (B), width (H), height (H), fps (H),
+#           byte order of the pixels (4s, e.g. b'BGRX')
+#   record  time in ms since the start (I), width * height * 4 bytes
+
+import csv
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from collections import deque
+
+import pygame
+
+magic = b'TTVF'
+version = 1
+header_format = struct.Struct('<4sBHHH4s')
+time_format = struct.Struct('<I')
+
+# Captured frames whose main-thread cost the p99 is taken over.
+overhead_window = 1000
+
+video_extensions = ('.mp4', '.mkv', '.webm', '.mov', '.avi')
+# Fast rather than small; screen content compresses well either way.
+png_compression = 1
+
+
+def channel_order(surface):
+    # The bytes of a 32 bit pixel in memory order, e.g. 'BGRX'.
+    order = ['X'] * 4
+    for name, shift, mask in zip('RGBA', surface.get_shifts(), surface.get_masks()):
+        if mask:
+            order[shift // 8] = name
+    if sys.byteorder == 'big':
+        order.reverse()
+    return ''.join(order)
+
+
+def pixels(surface):
+    # 32 bit pixels have no row padding, so the buffer is the frame.
+    return surface.get_buffer().raw
+
+
+class RawWriter(object):
+    def __init__(self, path, fps):
+        self.path = path
+        self.fps = fps
+        self.stream = None
+
+    def write(self, t, surface):
+        if self.stream is None:
+            self.stream = open(self.path, 'wb')
+            self.stream.write(header_format.pack(
+                magic, version, surface.get_width(), surface.get_height(), self.fps,
+                channel_order(surface).encode('ascii')))
+        self.stream.write(time_format.pack(t))
+        self.stream.write(pixels(surface))
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+
+
+def png_chunk(kind, data):
+    return (struct.pack('>I', len(data)) + kind + data
+            + struct.pack('>I', zlib.crc32(kind + data)))
+
+
+class PngWriter(object):
+    # frame_000000.png, ... in a directory, with their times in frames.csv.
+    # pygame.image.save holds the GIL for the whole encode, which stalls
+    # the game loop for tens of milliseconds; zlib releases it, so the
+    # PNGs are put together here.
+    def __init__(self, path, fps):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.index = 0
+        self.rgba = None
+        self.times = open(os.path.join(path, 'frames.csv'), 'w', newline='')
+        self.csv = csv.writer(self.times)
+        self.csv.writerow(('frame', 't'))
+
+    def encode(self, surface):
+        width, height = surface.get_size()
+        if self.rgba is None or self.rgba.get_size() != (width, height):
+            masks = (0xff, 0xff00, 0xff0000, 0xff000000)
+            if sys.byteorder == 'big':
+                masks = masks[::-1]
+            self.rgba = pygame.Surface((width, height), 0, 32, masks)
+        self.rgba.blit(surface, (0, 0))
+        data = pixels(self.rgba)
+        stride = width * 4
+        # Every row starts with its filter type, 0 (none).
+        rows = b''.join(b'\x00' + data[i:i + stride] for i in range(0, len(data), stride))
+        return (b'\x89PNG\r\n\x1a\n'
+                + png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+                + png_chunk(b'IDAT', zlib.compress(rows, png_compression))
+                + png_chunk(b'IEND', b''))
+
+    def write(self, t, surface):
+        with open(os.path.join(self.path, 'frame_%06d.png' % self.index), 'wb') as stream:
+            stream.write(self.encode(surface))
+        self.csv.writerow((self.index, t))
+        self.index += 1
+
+    def close(self):
+        self.times.close()
+
+
+class FfmpegWriter(object):
+    # Encodes through a local ffmpeg at a constant frame rate; gaps
+    # between frames (idle screens and drops) repeat the last frame.
+    def __init__(self, path, fps):
+        self.executable = shutil.which('ffmpeg')
+        if self.executable is None:
+            raise RuntimeError("ffmpeg not found")
+        self.path = path
+        self.fps = fps
+        self.process = None
+        self.emitted = 0
+        self.last = None
+
+    def write(self, t, surface):
+        if self.process is None:
+            pix_fmt = channel_order(surface).lower().replace('x', '0')
+            self.process = subprocess.Popen(
+                [self.executable, '-loglevel', 'error', '-y',
+                 '-f', 'rawvideo', '-pix_fmt', pix_fmt,
+                 '-s', '%dx%d' % surface.get_size(), '-framerate', str(self.fps),
+                 '-i', '-', '-c:v', 'libx264', '-preset', 'ultrafast',
+                 '-pix_fmt', 'yuv420p', self.path],
+                stdin=subprocess.PIPE)
+        frame = pixels(surface)
+        stdin = self.process.stdin
+        due = t * self.fps // 1000
+        while self.last is not None and self.emitted < due:
+            stdin.write(self.last)
+            self.emitted += 1
+        stdin.write(frame)
+        self.emitted += 1
+        self.last = frame
+
+    def close(self):
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.wait()
+
+
+def create_writer(path, fps):
+    # A video file when ffmpeg is available, a raw dump for .raw and a
+    # PNG sequence in a directory otherwise.
+    if path.lower().endswith(video_extensions):
+        try:
+            return FfmpegWriter(path, fps)
+        except RuntimeError:
+            path += '.raw'
+            print("ffmpeg not found, capturing raw frames to %s" % path, file=sys.stderr)
+    if path.lower().endswith('.raw'):
+        return RawWriter(path, fps)
+    return PngWriter(path, fps)
+
+
+class FrameCapture(object):
+    def __init__(self, writer, fps=30, scale=1.0, queue_size=8,
+                 clock=pygame.time.get_ticks):
+        self.writer = writer
+        self.interval = 1000.0 / fps
+        self.scale = scale
+        self.clock = clock
+        self.start = clock()
+        self.next_due = self.start
+        # Set when a frame was skipped as too early or dropped; the loop
+        # must wake up again at next_due to capture what is on screen.
+        self.missed = False
+        self.queue = queue.Queue(queue_size)
+        self.captured = 0
+        self.dropped = 0
+        self.written = 0
+        # Main-thread seconds per captured frame: the recent ones for the
+        # p99 and a running total for the mean.
+        self.overhead = deque(maxlen=overhead_window)
+        self.overhead_total = 0.0
+        self.error = None
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def offer(self, source, cursor=None):
+        # Called after every presented frame with the pointer as (position,
+        # radius).  source() returns a copy of the frame and whether it
+        # shows the pointer; it may be a slow GPU readback, so it is only
+        # called when the frame is going to be queued.
+        begin = time.perf_counter()
+        now = self.clock()
+        if now < self.next_due or self.error is not None:
+            self.missed = self.error is None
+            return False
+        self.next_due = self.start + ((now - self.start) // self.interval + 1) * self.interval
+        if self.queue.full():
+            self.dropped += 1
+            self.missed = True
+            return False
+        self.missed = False
+        surface, shows_cursor = source()
+        self.queue.put_nowait((now - self.start, surface, None if shows_cursor else cursor))
+        self.captured += 1
+        elapsed = time.perf_counter() - begin
+        self.overhead.append(elapsed)
+        self.overhead_total += elapsed
+        return True
+
+    def next_due_in(self, now):
+        if not self.missed:
+            return None
+        return max(int(self.next_due - now) + 1, 1)
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error is not None:
+                continue
+            t, surface, cursor = item
+            scale = self.scale
+            if scale != 1.0:
+                width, height = surface.get_size()
+                surface = pygame.transform.smoothscale(
+                    surface, (max(int(width * scale), 1), max(int(height * scale), 1)))
+            if cursor is not None and cursor[0] is not None:
+                (x, y), radius = cursor
+                center = (int(x * scale), int(y * scale))
+                pygame.draw.circle(surface, (255, 0, 255), center, radius * scale, 2)
+                pygame.draw.circle(surface, (255, 0, 255), center, max(int(4 * scale), 1))
+            try:
+                self.writer.write(int(t), surface)
+            except (OSError, pygame.error) as error:
+                # Keep draining the queue so the game never blocks on it.
+                self.error = error
+            else:
+                self.written += 1
+
+    def close(self):
+        self.queue.put(None)
+        self.worker.join()
+        try:
+            self.writer.close()
+        except OSError as error:
+            self.error = self.error or error
+
+    def overhead_ms(self):
+        # Mean over every captured frame and p99 over the recent ones.
+        ordered = sorted(self.overhead) or [0.0]
+        return (1e3 * self.overhead_total / max(self.captured, 1),
+                1e3 * ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)])
+
+    def report(self):
+        offered = self.captured + self.dropped
+        line = ("%d frames captured, %d written, %d dropped (%.1f%%); "
+                "%.2f ms mean, %.2f ms p99 on the main thread per captured frame"
+                % ((self.captured, self.written, self.dropped,
+                    100.0 * self.dropped / max(offered, 1)) + self.overhead_ms()))
+        if self.error is not None:
+            line += "; stopped writing: %s" % self.error
+        return line
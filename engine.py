@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Headless game core.
+#
+# GameState holds everything a game of tetris needs - board, falling and
+# next stone, score, level, lines - and the operations that change it.
+# It has no pygame or display dependency and draws its pieces from its
+# own seeded random.Random, so games can be simulated and reproduced on
+# machines without a screen.  Gravity is driven from outside: call tick()
+# every gravity_delay milliseconds, which the speed curve derives from the
+# level.
+
+import random
+
+from board import cols, get_backend
+from pieces import piece_table, rotate
+
+linescores = [0, 40, 100, 300, 1200]
+
+
+def default_speed_curve(level):
+    # Gravity delay in milliseconds at a level.
+    return max(100, 1000-50*(level-1))
+
+
+def stepped_speed_curve(delays):
+    # A speed curve from a list of per-level delays; the last one holds
+    # for every higher level.
+    delays = list(delays)
+    return lambda level: delays[min(level, len(delays)) - 1]
+
+
+class GameState(object):
+    def __init__(self, seed=None, board_backend='list', rng=None,
+                 speed_curve=default_speed_curve):
+        # rng may be any object with randrange(), for callers that need to
+        # script the piece sequence.
+        self.seed = seed
+        self.speed_curve = speed_curve
+        self.rng = random.Random(seed) if rng is None else rng
+        self.backend = get_backend(board_backend)
+        self.next_stone = self.random_piece()
+        self.gameover = False
+        self.paused = False
+        self.init_game()
+
+    def random_piece(self):
+        return piece_table[self.rng.randrange(len(piece_table))][0]
+
+    def new_stone(self):
+        self.stone = self.next_stone
+        self.next_stone = self.random_piece()
+        self.stone_x = int(cols / 2 - self.stone.width/2)
+        self.stone_y = 0
+
+        if self.backend.check_collision(self.board,
+                                        self.stone,
+                                        (self.stone_x, self.stone_y)):
+            self.gameover = True
+
+    def init_game(self):
+        self.board = self.backend.new_board()
+        self.new_stone()
+        self.level = 1
+        self.score = 0
+        self.lines = 0
+
+    @property
+    def gravity_delay(self):
+        return self.speed_curve(self.level)
+
+    def cells(self):
+        return self.backend.cells(self.board)
+
+    def add_cl_lines(self, n):
+        self.lines += n
+        self.score += linescores[n] * self.level
+        if self.lines >= self.level*6:
+            self.level += 1
+
+    def move(self, delta_x):
+        if not self.gameover and not self.paused:
+            new_x = self.stone_x + delta_x
+            if new_x < 0:
+                new_x = 0
+            if new_x > cols - self.stone.width:
+                new_x = cols - self.stone.width
+            if not self.backend.check_collision(self.board,
+                                                self.stone,
+                                                (new_x, self.stone_y)):
+                self.stone_x = new_x
+
+    def drop(self, manual):
+        if not self.gameover and not self.paused:
+            self.score += 1 if manual else 0
+            self.stone_y += 1
+            if self.backend.check_collision(self.board,
+                                            self.stone,
+                                            (self.stone_x, self.stone_y)):
+                self.board = self.backend.join_matrixes(
+                    self.board,
+                    self.stone,
+                    (self.stone_x, self.stone_y))
+                # Only the rows the stone locked into can have filled up.
+                touched = range(self.stone_y - 1, self.stone_y - 1 + self.stone.height)
+                self.new_stone()
+                self.board, cleared_rows = self.backend.clear_rows(self.board, touched)
+                self.add_cl_lines(cleared_rows)
+                return True
+        return False
+
+    def tick(self):
+        return self.drop(False)
+
+    def soft_drop(self):
+        return self.drop(True)
+
+    def ghost_y(self):
+        return self.backend.landing_y(self.board, self.stone,
+                                      self.stone_x, self.stone_y)
+
+    def hard_drop(self):
+        # Same outcome and score as calling drop(True) until the stone
+        # locks, without stepping through every row.
+        if not self.gameover and not self.paused:
+            landing = self.ghost_y()
+            self.score += landing - self.stone_y
+            self.stone_y = landing
+            self.drop(True)
+
+    def rotate(self):
+        if not self.gameover and not self.paused:
+            new_stone = rotate(self.stone)
+            if not self.backend.check_collision(self.board,
+                                                new_stone,
+                                                (self.stone_x, self.stone_y)):
+                self.stone = new_stone
+
+    def toggle_pause(self):
+        self.paused = not self.paused
+
+    def start_game(self):
+        if self.gameover:
+            self.init_game()
+            self.gameover = False
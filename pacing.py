@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Event-driven frame pacing.
+#
+# Instead of redrawing at a fixed rate, the main loop asks the pacer
+# whether a frame is due: one is due after any event (gravity tick, key,
+# pointer motion), when the cursor moved, or when a caller-supplied
+# timeout expired (e.g. the next step of a dwell countdown).  Otherwise
+# the pacer blocks in pygame.event.wait(), so a paused or idle game
+# sleeps instead of spinning.  While frames keep coming they are capped
+# at max_fps.
+
+import pygame
+
+
+class FramePacer(object):
+    def __init__(self, max_fps, idle_timeout=1000):
+        self.max_fps = max_fps
+        self.idle_timeout = idle_timeout
+        self.clock = pygame.time.Clock()
+        self.pending = True
+        self.cursor = None
+        self.rendered = False
+
+    def invalidate(self):
+        self.pending = True
+
+    def frame_due(self, cursor_pos):
+        if cursor_pos != self.cursor:
+            self.cursor = cursor_pos
+            self.pending = True
+        self.rendered = self.pending
+        self.pending = False
+        return self.rendered
+
+    def wait(self, timeout=None):
+        # Return the next batch of events, blocking for at most timeout ms
+        # (idle_timeout when None) if nothing is queued.
+        if self.rendered:
+            self.clock.tick(self.max_fps)
+        events = pygame.event.get()
+        if not events:
+            event = pygame.event.wait(
+                self.idle_timeout if timeout is None else max(timeout, 1))
+            if event.type != pygame.NOEVENT:
+                events = [event] + pygame.event.get()
+        # A requested timeout is a scheduled wakeup, so it gets a frame too.
+        if events or timeout is not None:
+            self.pending = True
+        return events
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Precomputed piece table.
+#
+# Every rotation of every shape in tetris_shapes is built once at import
+# as an immutable Piece, so rotating a stone is an index increment and
+# collision checks only visit the occupied cells.  `masks` holds one
+# bitmask per piece row and `packed` the same rows laid out with the
+# bitboard's row stride of cols + 1 bits.  `bottoms` gives, per column
+# of the piece, the lowest occupied row, for skyline-based landing.
+
+from board import cols, rotate_clockwise, tetris_shapes
+
+
+class Piece(object):
+    __slots__ = ('kind', 'rotation', 'color', 'width', 'height',
+                 'cells', 'masks', 'packed', 'bottoms', 'shape')
+
+    def __init__(self, kind, rotation, shape):
+        setattr_ = object.__setattr__
+        setattr_(self, 'kind', kind)
+        setattr_(self, 'rotation', rotation)
+        setattr_(self, 'color', max(max(row) for row in shape))
+        setattr_(self, 'width', len(shape[0]))
+        setattr_(self, 'height', len(shape))
+        setattr_(self, 'cells', tuple(
+            (cx, cy)
+            for cy, row in enumerate(shape)
+            for cx, cell in enumerate(row) if cell))
+        setattr_(self, 'masks', tuple(
+            sum(1 << cx for cx, cell in enumerate(row) if cell)
+            for row in shape))
+        setattr_(self, 'packed', sum(
+            mask << (cy * (cols + 1)) for cy, mask in enumerate(self.masks)))
+        setattr_(self, 'bottoms', tuple(
+            max(cy for cy, row in enumerate(shape) if row[cx])
+            for cx in range(self.width)))
+        setattr_(self, 'shape', tuple(tuple(row) for row in shape))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Piece is immutable")
+
+    def __repr__(self):
+        return "Piece(kind=%d, rotation=%d)" % (self.kind, self.rotation)
+
+
+def _rotations(kind, shape):
+    rotations = []
+    for rotation in range(4):
+        rotations.append(Piece(kind, rotation, shape))
+        shape = rotate_clockwise(shape)
+    return tuple(rotations)
+
+
+piece_table = tuple(_rotations(kind, shape)
+                    for kind, shape in enumerate(tetris_shapes))
+
+
+def rotate(piece):
+    return piece_table[piece.kind][(piece.rotation + 1) % 4]
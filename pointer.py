@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Pointer and gaze input pipeline.
+#
+# Sources push every sample they get - one per MOUSEMOTION event, or per
+# report of an eye tracker, possibly from its own thread - as (time in
+# ms, x, y) into a bounded ring buffer.  Mouse samples are timed when the
+# main loop receives their events, as pygame does not expose SDL's event
+# timestamps, so motion queued during one wait shares a time; a tracker
+# can push the time of each of its reports.  Once per frame the pipeline
+# drains the buffer, runs each sample through an optional smoothing
+# filter and feeds the result to the swipe detector, so gestures are
+# classified from the full sample stream instead of one snapshot per
+# frame.  The app then advances the dwell timers with the same samples
+# and their own timestamps.
+#
+# A TraceSource replays a recorded trace (CSV of t,x,y in canvas
+# coordinates) in place of a live device.
+
+import csv
+import math
+from collections import deque
+
+
+class OneEuroFilter(object):
+    # Casiez et al.'s 1 Euro filter: a low-pass filter whose cutoff rises
+    # with speed, removing jitter at rest without lagging fast movements.
+    def __init__(self, min_cutoff=1.0, beta=0.007, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self.last_t = None
+        self.value = None
+        self.speed = (0.0, 0.0)
+
+    @staticmethod
+    def alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, t, x, y):
+        if self.last_t is None:
+            self.last_t, self.value = t, (float(x), float(y))
+            return x, y
+        dt = max((t - self.last_t) / 1000.0, 1e-3)
+        self.last_t = t
+        d_alpha = self.alpha(self.d_cutoff, dt)
+        value, speed = [], []
+        for raw, previous, previous_speed in zip((x, y), self.value, self.speed):
+            rate = previous_speed + d_alpha * ((raw - previous) / dt - previous_speed)
+            alpha = self.alpha(self.min_cutoff + self.beta * abs(rate), dt)
+            value.append(previous + alpha * (raw - previous))
+            speed.append(rate)
+        self.value, self.speed = tuple(value), tuple(speed)
+        return int(round(value[0])), int(round(value[1]))
+
+
+class SwipeDetector(object):
+    # A swipe starts where the pointer path enters area and is classified
+    # at the first sample outside it, by the larger-than-min_distance
+    # component of the movement: 'left', 'right', 'up' or 'down'.
+    # Each step between samples is clipped against the area, so a path
+    # that crosses it between two samples still counts.
+    def __init__(self, area, min_distance):
+        self.area = area
+        self.min_distance = min_distance
+        self.enter = None
+        self.last = None
+
+    def reset(self):
+        self.enter = None
+        self.last = None
+
+    def feed(self, pos):
+        previous, self.last = self.last, pos
+        area = self.area
+        if self.enter is None:
+            if previous is None:
+                if area.collidepoint(pos):
+                    self.enter = pos
+                return None
+            crossed = area.clipline(previous, pos)
+            if not crossed:
+                return None
+            self.enter = crossed[0] if not area.collidepoint(previous) else previous
+            if area.collidepoint(pos):
+                return None
+        elif area.collidepoint(pos):
+            return None
+        return self.classify(pos)
+
+    def classify(self, leave):
+        enter, self.enter = self.enter, None
+        dx = enter[0] - leave[0]
+        dy = enter[1] - leave[1]
+        if dx > self.min_distance:
+            return 'left'
+        if dx < -self.min_distance:
+            return 'right'
+        if dy > self.min_distance:
+            return 'up'
+        if dy < -self.min_distance:
+            return 'down'
+        return None
+
+
+class MouseSource(object):
+    # Samples from MOUSEMOTION events; position is where the pointer is to
+    # start with and transform maps event positions to canvas coordinates.
+    def __init__(self, position, transform=None):
+        self.transform = transform
+        self.initial = position
+
+    def map(self, pos):
+        return self.transform(pos) if self.transform is not None else pos
+
+    def feed(self, pipeline, event, now):
+        x, y = self.map(event.pos)
+        pipeline.push(now, x, y)
+
+    def poll(self, pipeline, now):
+        pass
+
+    def next_due_in(self, now):
+        return None
+
+
+class TraceSource(object):
+    # Replays recorded (t, x, y) samples; t is relative to the start of
+    # the trace, which is the first poll.
+    def __init__(self, samples):
+        self.samples = sorted(samples)
+        self.initial = self.samples[0][1:] if self.samples else (0, 0)
+        self.position = 0
+        self.start = None
+
+    @classmethod
+    def load(cls, path):
+        with open(path, newline='') as stream:
+            return cls([(int(float(t)), int(x), int(y))
+                        for t, x, y in csv.reader(stream) if t != 't'])
+
+    def feed(self, pipeline, event, now):
+        pass
+
+    def poll(self, pipeline, now):
+        if self.start is None:
+            self.start = now - self.samples[0][0] if self.samples else now
+        samples = self.samples
+        while self.position < len(samples) and samples[self.position][0] + self.start <= now:
+            t, x, y = samples[self.position]
+            pipeline.push(t + self.start, x, y)
+            self.position += 1
+
+    def next_due_in(self, now):
+        if self.start is None or self.position >= len(self.samples):
+            return None
+        return max(int(self.samples[self.position][0] + self.start - now), 1)
+
+
+def save_trace(path, samples):
+    with open(path, 'w', newline='') as stream:
+        writer = csv.writer(stream)
+        writer.writerow(('t', 'x', 'y'))
+        writer.writerows(samples)
+
+
+class PointerPipeline(object):
+    def __init__(self, source, smoothing=None, swipe=None, capacity=4096,
+                 keep_trace=False):
+        self.source = source
+        self.smoothing = smoothing
+        self.swipe = swipe
+        # Raw samples waiting for the next frame.  deque appends are
+        # atomic, so a tracker thread may push while the loop drains.
+        self.pending = deque(maxlen=capacity)
+        self.overflowed = 0
+        self.position = source.initial
+        self.trace = [] if keep_trace else None
+
+    def push(self, t, x, y):
+        if len(self.pending) == self.pending.maxlen:
+            self.overflowed += 1
+        self.pending.append((t, x, y))
+
+    def feed(self, event, now):
+        self.source.feed(self, event, now)
+
+    def update(self, now):
+        # Drain the buffered samples taken by now; returns them filtered
+        # as [(t, (x, y))] and the swipes they completed as [(t, direction)].
+        self.source.poll(self, now)
+        pending = self.pending
+        samples, swipes = [], []
+        while pending and pending[0][0] <= now:
+            t, x, y = pending.popleft()
+            if self.trace is not None:
+                self.trace.append((t, x, y))
+            pos = self.smoothing(t, x, y) if self.smoothing is not None else (x, y)
+            samples.append((t, pos))
+            if self.swipe is not None:
+                direction = self.swipe.feed(pos)
+                if direction is not None:
+                    swipes.append((t, direction))
+        if samples:
+            self.position = samples[-1][1]
+        return samples, swipes
+
+    def next_due_in(self, now):
+        return self.source.next_due_in(now)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Opt-in frame profiler.
+#
+# The main loop calls start() when an iteration begins its work, lap(stage)
+# after each stage and end_frame() before it goes back to sleep, so the
+# time spent blocked waiting for events is never counted.  A stage may be
+# lapped several times per iteration; the times add up.  Percentiles and
+# dropped frames are computed over the most recent rendered frames; a
+# frame counts as dropped when its work alone took longer than one frame
+# at max_fps.  Given a path, every iteration is written to it as CSV or
+# JSON when it ends, so a long session holds no more than the window.
+
+import csv
+import json
+import time
+from collections import deque
+
+stages = ('events', 'logic', 'widgets', 'draw', 'present', 'capture')
+
+# Columns of the exported per-frame data; times are in milliseconds.
+fields = ('frame', 'time') + stages + ('total', 'rendered', 'dropped')
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class FrameProfiler(object):
+    def __init__(self, max_fps, window=600, refresh_ms=500, path=None):
+        self.budget = 1000.0 / max_fps
+        # The most recent rendered frames, as exported.
+        self.window = deque(maxlen=window)
+        self.refresh_ms = refresh_ms
+        self.count = 0
+        self.origin = time.perf_counter()
+        self.mark = self.origin
+        self.current = dict.fromkeys(stages, 0.0)
+        self.rendered = 0
+        self.dropped = 0
+        self.summary = []
+        self.summary_at = None
+        self.path = path
+        self.stream = self.writer = None
+        if path is not None:
+            self.stream = open(path, 'w', newline='')
+            if path.endswith('.json'):
+                self.stream.write('{"budget_ms": %s, "frames": [' % json.dumps(self.budget))
+            else:
+                self.writer = csv.writer(self.stream)
+                self.writer.writerow(fields)
+
+    def start(self):
+        self.mark = time.perf_counter()
+        self.begin = self.mark
+        self.current = dict.fromkeys(stages, 0.0)
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.current[stage] += (now - self.mark) * 1e3
+        self.mark = now
+
+    def end_frame(self, rendered):
+        current = self.current
+        total = sum(current.values())
+        dropped = rendered and total > self.budget
+        frame = ((self.count, (self.begin - self.origin) * 1e3)
+                 + tuple(current[stage] for stage in stages)
+                 + (total, int(rendered), int(dropped)))
+        self.count += 1
+        if rendered:
+            self.window.append(frame)
+            self.rendered += 1
+            self.dropped += dropped
+        if self.writer is not None:
+            self.writer.writerow(frame)
+        elif self.stream is not None:
+            self.stream.write((',' if frame[0] else '') + json.dumps(dict(zip(fields, frame))))
+
+    def stats(self):
+        total = fields.index('total')
+        ordered = sorted(frame[total] for frame in self.window)
+        return {
+            'frames': self.rendered,
+            'dropped': self.dropped,
+            'p50': percentile(ordered, 0.50),
+            'p95': percentile(ordered, 0.95),
+            'p99': percentile(ordered, 0.99),
+        }
+
+    def overlay_lines(self):
+        # Text for the on-screen overlay, refreshed every refresh_ms so
+        # the overlay does not re-render text on every frame.
+        now = time.perf_counter()
+        if self.summary_at is None or (now - self.summary_at) * 1e3 >= self.refresh_ms:
+            self.summary_at = now
+            stats = self.stats()
+            recent = self.window
+            means = ["%s %.2f" % (stage, sum(frame[2 + i] for frame in recent) / len(recent))
+                     for i, stage in enumerate(stages)] if recent else []
+            self.summary = [
+                "frame ms p50 %.2f  p95 %.2f  p99 %.2f" % (
+                    stats['p50'], stats['p95'], stats['p99']),
+                "dropped %d of %d (budget %.1f ms)" % (
+                    stats['dropped'], stats['frames'], self.budget),
+                "mean ms " + "  ".join(means),
+            ]
+        return self.summary
+
+    def close(self):
+        # Finish the file at path: JSON when it ends in .json, CSV otherwise.
+        if self.stream is None:
+            return
+        if self.writer is None:
+            self.stream.write('], "stats": %s}' % json.dumps(self.stats()))
+        self.stream.close()
+        self.stream = self.writer = None
+
+    def report(self):
+        stats = self.stats()
+        return ("%d frames, p50 %.2f ms, p95 %.2f ms, p99 %.2f ms, %d dropped"
+                % (stats['frames'], stats['p50'], stats['p95'], stats['p99'],
+                   stats['dropped']))
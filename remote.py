@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Client side of server.py for TetrisApp.
+#
+# A RemoteGame stands in for the GameState the app drives when the game
+# runs on a server: inputs go out as ACTION messages, and the board, the
+# stones and the score are mirrored from the server's row deltas.  A
+# reader thread receives the updates and wakes the main loop by posting
+# an event; apply_updates() then folds them in on the main thread, so
+# the app never reads a half-applied update.  Gravity runs on the
+# server, so tick() does nothing.
+
+import socket
+import threading
+from collections import deque
+
+import board
+from engine import default_speed_curve
+from pieces import piece_table
+from replay import (HARD_DROP, MOVE_LEFT, MOVE_RIGHT, ROTATE, SOFT_DROP,
+                    START_GAME, TOGGLE_PAUSE)
+from server import (ACTION, CLOSED, ERROR, GAMEOVER, NEW, PAUSED, UPDATE, WATCH,
+                    WELCOME, action_format, error_format, frame, length_format,
+                    new_format, parse_address, read_update, watch_format,
+                    welcome_format)
+
+error_messages = {1: "no such session", 2: "not the player of this session",
+                  3: "bad message"}
+
+
+def connect(address):
+    address = parse_address(address)
+    if isinstance(address, tuple):
+        sock = socket.create_connection(address)
+        # Inputs are tiny and latency matters more than packet count.
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(address)
+    return sock
+
+
+class RemoteGame(object):
+    def __init__(self, address, session=None, seed=None, wake=None):
+        # Starts a new session to play, or watches session when given.
+        # wake() is called from the reader thread whenever updates arrive.
+        self.sock = connect(address)
+        self.stream = self.sock.makefile('rb')
+        self.playing = session is None
+        if self.playing:
+            self.sock.sendall(frame(new_format.pack(NEW, seed is not None, seed or 0)))
+        else:
+            self.sock.sendall(frame(watch_format.pack(WATCH, session)))
+        body = self.read()
+        if body is not None and body[0] == ERROR:
+            raise ValueError("session %d: %s" % (
+                session, error_messages.get(error_format.unpack(body)[2], "refused")))
+        if body is None or body[0] != WELCOME:
+            raise ConnectionError("no welcome from the server")
+        _, self.session, self.seed = welcome_format.unpack(body)
+
+        self.backend = board
+        self.board = board.new_board()
+        self.speed_curve = default_speed_curve
+        self.score = self.lines = 0
+        self.level = 1
+        self.gameover = self.paused = False
+        self.closed = False
+        self.seq = 0
+        self.wake = wake
+        self.updates = deque()
+        # Block for the first keyframe so the first frame is complete.
+        body = self.read()
+        while body is not None and body[0] != UPDATE:
+            body = self.read()
+        if body is None:
+            raise ConnectionError("the server closed the session")
+        self.apply(body)
+        threading.Thread(target=self.receive, daemon=True).start()
+
+    def read(self):
+        # The next message body, or None when the connection is gone.
+        try:
+            header = self.stream.read(length_format.size)
+            if len(header) < length_format.size:
+                return None
+            length, = length_format.unpack(header)
+            body = self.stream.read(length)
+        except OSError:
+            return None
+        return body if len(body) == length else None
+
+    def receive(self):
+        updates = self.updates
+        while True:
+            body = self.read()
+            done = body is None or body[0] == CLOSED
+            if done:
+                updates.append(None)
+            elif body[0] == UPDATE:
+                updates.append(body)
+            else:
+                continue
+            # One wakeup per batch: the main loop drains the whole queue.
+            if self.wake is not None and len(updates) == 1:
+                self.wake()
+            if done:
+                return
+
+    def apply_updates(self):
+        # Apply the updates received so far; returns False once the
+        # server has closed the session.
+        updates = self.updates
+        while updates:
+            body = updates.popleft()
+            if body is None:
+                self.closed = True
+                break
+            self.apply(body)
+        return not self.closed
+
+    def apply(self, body):
+        fields, changed = read_update(body)
+        (_, _, _, _, self.score, self.lines, self.level, flags, kind, rotation,
+         self.stone_x, self.stone_y, next_kind, _) = fields
+        self.gameover = bool(flags & GAMEOVER)
+        self.paused = bool(flags & PAUSED)
+        self.stone = piece_table[kind][rotation]
+        self.next_stone = piece_table[next_kind][0]
+        for y, colors in changed:
+            self.board[y] = list(colors)
+
+    def send(self, code):
+        # Watchers cannot play; their inputs are dropped here.
+        if self.playing and not self.closed:
+            self.seq += 1
+            try:
+                self.sock.sendall(frame(action_format.pack(ACTION, self.session,
+                                                           self.seq, code)))
+            except OSError:
+                self.closed = True
+
+    @property
+    def gravity_delay(self):
+        return self.speed_curve(self.level)
+
+    def cells(self):
+        return self.board
+
+    def ghost_y(self):
+        return board.landing_y(self.board, self.stone, self.stone_x, self.stone_y)
+
+    def move(self, delta_x):
+        self.send(MOVE_LEFT if delta_x < 0 else MOVE_RIGHT)
+
+    def rotate(self):
+        self.send(ROTATE)
+
+    def soft_drop(self):
+        self.send(SOFT_DROP)
+
+    def hard_drop(self):
+        self.send(HARD_DROP)
+
+    def tick(self):
+        pass
+
+    def toggle_pause(self):
+        self.send(TOGGLE_PAUSE)
+
+    def start_game(self):
+        self.send(START_GAME)
+
+    def close(self):
+        self.closed = True
+        try:
+            # close() alone leaves the socket open while the reader thread's
+            # file object holds it; shutdown also ends that thread's read.
+            self.sock.shutdown(socket.SHUT_RDWR)
+            self.sock.close()
+        except OSError:
+            pass
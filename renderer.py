@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Retained-mode renderer.
+#
+# Every frame the app declares what should be visible: a static layer
+# (background, playfield grid, frames and button boxes, rendered once per
+# screen) plus a list of sprite blits (cells, pieces and text).  The
+# renderer diffs that list against the previous frame, repaints only the
+# regions whose sprites appeared, moved or disappeared, and hands just
+# those rectangles to pygame.display.update().  Cell sprites and text
+# surfaces are cached, so a frame where nothing changed costs no drawing.
+#
+# Drawing happens on a canvas of fixed logical size with integer cell
+# sizes.  When the display is larger, the changed part of the canvas is
+# scaled onto it in one call per frame, so the drawing cost does not
+# depend on the monitor.  TextureRenderer keeps the same interface but
+# draws with an SDL2 hardware renderer, which does the scaling on the GPU.
+
+from fractions import Fraction
+
+import pygame
+
+# Rendered text is cached by (line, colors); the HUD strings change only
+# with the score, so this bound is never reached in normal play.
+max_cached_texts = 512
+
+
+def scale_grid(logical, physical):
+    # Logical coordinates that are multiples of the grid map to whole
+    # physical pixels, so regions aligned to it scale seamlessly.
+    grid = Fraction(physical, logical).denominator
+    return grid if grid <= logical // 4 else logical
+
+
+class Renderer(object):
+    def __init__(self, screen, font, cell_size, colors, logical_size=None):
+        self.screen = screen
+        if logical_size is None or tuple(logical_size) == screen.get_size():
+            self.scaled = False
+            logical_size = screen.get_size()
+        else:
+            self.scaled = True
+            self.grid = (scale_grid(logical_size[0], screen.get_width()),
+                         scale_grid(logical_size[1], screen.get_height()))
+        self.canvas = self.new_surface(logical_size)
+        self.font = font
+        self.cell_size = cell_size
+        self.colors = colors
+        self.cell_sprites = {}
+        self.ghost_sprites = {}
+        self.text_cache = {}
+        self.layers = {}
+        self.layer = None
+        self.items = {}
+        self.shown = {}
+        self.full_redraw = True
+        self.cursor_rect = None
+
+    def new_surface(self, size):
+        return pygame.Surface(size).convert()
+
+    def cell_sprite(self, val):
+        sprite = self.cell_sprites.get(val)
+        if sprite is None:
+            size = int(self.cell_size)
+            sprite = self.new_surface((size, size))
+            sprite.fill(self.colors[val])
+            pygame.draw.rect(sprite, self.colors[-1], sprite.get_rect(), 2)
+            self.cell_sprites[val] = sprite
+        return sprite
+
+    def ghost_sprite(self, val):
+        # Outline-only cell used to preview where a piece would land.
+        sprite = self.ghost_sprites.get(val)
+        if sprite is None:
+            size = int(self.cell_size)
+            sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+            pygame.draw.rect(sprite, self.colors[val], sprite.get_rect(), 2)
+            self.ghost_sprites[val] = sprite
+        return sprite
+
+    def text(self, line, text_color, bg_color):
+        key = (line, text_color, bg_color)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            if len(self.text_cache) >= max_cached_texts:
+                self.text_cache.clear()
+            surface = self.font.render(line, False, text_color, bg_color)
+            self.text_cache[key] = surface
+        return surface
+
+    def begin(self, layer, build):
+        # Start a frame on the named static layer; build(surface) paints it
+        # the first time the layer is used.
+        if layer != self.layer:
+            if layer not in self.layers:
+                surface = self.new_surface(self.canvas.get_size())
+                build(surface)
+                self.layers[layer] = surface
+            self.layer = layer
+            self.full_redraw = True
+        self.items = {}
+
+    def invalidate(self):
+        self.full_redraw = True
+
+    def blit(self, surface, pos):
+        self.items[(surface, pos)] = None
+
+    def draw_cells(self, surface, matrix, origin, limit=None):
+        # Paint matrix cells straight onto surface; used for static layers.
+        for y, x, sprite, pos in self._cells(matrix, origin, limit):
+            surface.blit(sprite, pos)
+
+    def queue_cells(self, matrix, origin, limit=None, ghost=False):
+        for y, x, sprite, pos in self._cells(matrix, origin, limit, ghost):
+            self.items[(sprite, pos)] = None
+
+    def _cells(self, matrix, origin, limit, ghost=False):
+        # origin is the pixel position of matrix[0][0]; cells are whole
+        # multiples of the cell size from it, so none is a pixel off.
+        sprite_for = self.ghost_sprite if ghost else self.cell_sprite
+        cell_size = int(self.cell_size)
+        off_x, off_y = origin
+        for y, row in enumerate(matrix):
+            if limit is not None and y >= limit:
+                break
+            for x, val in enumerate(row):
+                if val:
+                    yield y, x, sprite_for(val), (
+                        off_x + x * cell_size, off_y + y * cell_size)
+
+    def present(self, cursor_pos=None, cursor_radius=0):
+        canvas = self.canvas
+        layer = self.layers[self.layer]
+        items = self.items
+        if self.full_redraw:
+            canvas.blit(layer, (0, 0))
+            for surface, pos in items:
+                canvas.blit(surface, pos)
+            dirty = [canvas.get_rect()]
+            self.full_redraw = False
+        else:
+            shown = self.shown
+            dirty = [pygame.Rect(pos, surface.get_size())
+                     for surface, pos in shown if (surface, pos) not in items]
+            dirty += [pygame.Rect(pos, surface.get_size())
+                      for surface, pos in items if (surface, pos) not in shown]
+            for rect in dirty:
+                canvas.blit(layer, rect, rect)
+            if dirty:
+                # Repaint every sprite overlapping a dirty region, clipped
+                # to that region, in draw order.
+                for surface, pos in items:
+                    rect = pygame.Rect(pos, surface.get_size())
+                    for index in rect.collidelistall(dirty):
+                        clip = rect.clip(dirty[index])
+                        canvas.blit(surface, clip.topleft,
+                                    clip.move(-pos[0], -pos[1]))
+        self.shown = items
+
+        if cursor_pos is not None:
+            size = int(cursor_radius) * 2 + 4
+            cursor_rect = pygame.Rect(0, 0, size, size)
+            cursor_rect.center = cursor_pos
+        else:
+            cursor_rect = None
+        moved = cursor_rect != self.cursor_rect
+        if moved:
+            # Restoring the canvas under the old cursor erases it.
+            if self.cursor_rect is not None:
+                dirty.append(self.cursor_rect)
+            self.cursor_rect = cursor_rect
+
+        updated = self.copy_to_screen(dirty)
+        # Scaled, copy_to_screen covers more than the dirty rects, so the
+        # cursor is checked against what was actually copied over.
+        if cursor_rect is not None:
+            if moved or self.cursor_on_screen(cursor_rect).collidelist(updated) != -1:
+                updated.append(self.draw_cursor(cursor_pos, cursor_radius, cursor_rect))
+
+        if updated:
+            pygame.display.update(updated)
+        return dirty
+
+    def to_screen(self, rect):
+        # The display rectangle covering a canvas rectangle.
+        canvas_w, canvas_h = self.canvas.get_size()
+        screen_w, screen_h = self.screen.get_size()
+        left = rect.left * screen_w // canvas_w
+        top = rect.top * screen_h // canvas_h
+        return pygame.Rect(left, top,
+                           -(-rect.right * screen_w // canvas_w) - left,
+                           -(-rect.bottom * screen_h // canvas_h) - top)
+
+    def copy_to_screen(self, dirty):
+        canvas, screen = self.canvas, self.screen
+        if not self.scaled:
+            for rect in dirty:
+                screen.blit(canvas, rect, rect)
+            return list(dirty)
+        if not dirty:
+            return []
+        # One scale per frame: the bounding box of the changes, widened to
+        # the scale grid so it lands on whole display pixels.
+        area = dirty[0].unionall(dirty[1:]).clip(canvas.get_rect())
+        grid_x, grid_y = self.grid
+        left = area.left - area.left % grid_x
+        top = area.top - area.top % grid_y
+        right = min(-(-area.right // grid_x) * grid_x, canvas.get_width())
+        bottom = min(-(-area.bottom // grid_y) * grid_y, canvas.get_height())
+        area = pygame.Rect(left, top, right - left, bottom - top)
+        target = self.to_screen(area).clip(screen.get_rect())
+        pygame.transform.scale(canvas.subsurface(area), target.size,
+                               screen.subsurface(target))
+        return [target]
+
+    def capture_source(self):
+        # A copy of the presented frame for capture.FrameCapture, and
+        # whether it shows the cursor: the canvas does not, it is drawn on
+        # the display.
+        return self.canvas.copy(), False
+
+    def cursor_on_screen(self, cursor_rect):
+        return self.to_screen(cursor_rect) if self.scaled else cursor_rect
+
+    def draw_cursor(self, cursor_pos, cursor_radius, cursor_rect):
+        screen = self.screen
+        if self.scaled:
+            scale = screen.get_height() / self.canvas.get_height()
+            cursor_pos = (int(cursor_pos[0] * scale), int(cursor_pos[1] * scale))
+            cursor_radius *= scale
+        pygame.draw.circle(screen, (255, 0, 255), cursor_pos, cursor_radius, 2)
+        pygame.draw.circle(screen, (255, 0, 255), cursor_pos, 4)
+        return self.cursor_on_screen(cursor_rect)
+
+
+class TextureRenderer(Renderer):
+    # The same frame interface drawn through pygame._sdl2: the static
+    # layer, cell sprites and text are uploaded once as textures and the
+    # renderer scales the logical canvas to the window.  Every presented
+    # frame is composed from scratch, which the GPU makes cheap.
+    def __init__(self, window, renderer, font, cell_size, colors, logical_size):
+        self.window = window
+        self.renderer = renderer
+        self.texture_class = _sdl2_video().Texture
+        renderer.logical_size = tuple(logical_size)
+        self.logical_size = tuple(logical_size)
+        self.font = font
+        self.cell_size = cell_size
+        self.colors = colors
+        self.cell_sprites = {}
+        self.ghost_sprites = {}
+        self.text_cache = {}
+        self.textures = {}
+        self.layers = {}
+        self.layer = None
+        self.items = {}
+        self.shown = {}
+        self.full_redraw = True
+        self.cursor = None
+        self.cursor_sprite = None
+
+    def new_surface(self, size):
+        return pygame.Surface(size)
+
+    def begin(self, layer, build):
+        if layer != self.layer:
+            if layer not in self.layers:
+                surface = self.new_surface(self.logical_size)
+                build(surface)
+                self.layers[layer] = self.texture_class.from_surface(
+                    self.renderer, surface)
+            self.layer = layer
+            self.full_redraw = True
+        self.items = {}
+
+    def texture(self, surface):
+        texture = self.textures.get(surface)
+        if texture is None:
+            if len(self.textures) >= 2 * max_cached_texts:
+                self.textures.clear()
+            texture = self.texture_class.from_surface(self.renderer, surface)
+            self.textures[surface] = texture
+        return texture
+
+    def present(self, cursor_pos=None, cursor_radius=0):
+        items = self.items
+        cursor = (cursor_pos, cursor_radius) if cursor_pos is not None else None
+        if not self.full_redraw and items == self.shown and cursor == self.cursor:
+            return []
+        self.full_redraw = False
+        self.shown = items
+        self.cursor = cursor
+
+        renderer = self.renderer
+        renderer.draw_color = (0, 0, 0, 255)
+        renderer.clear()
+        self.layers[self.layer].draw()
+        for surface, pos in items:
+            self.texture(surface).draw(dstrect=pygame.Rect(pos, surface.get_size()))
+        if cursor is not None:
+            sprite = self.cursor_texture(cursor_radius)
+            rect = sprite.get_rect()
+            rect.center = cursor_pos
+            sprite.draw(dstrect=rect)
+        renderer.present()
+        return [pygame.Rect((0, 0), self.logical_size)]
+
+    def capture_source(self):
+        # Read back from the GPU at window resolution, cursor included;
+        # far slower than copying the software canvas.
+        return self.renderer.to_surface(), True
+
+    def cursor_texture(self, cursor_radius):
+        if self.cursor_sprite is None or self.cursor_sprite[0] != cursor_radius:
+            size = int(cursor_radius) * 2 + 4
+            surface = pygame.Surface((size, size), pygame.SRCALPHA)
+            center = (size // 2, size // 2)
+            pygame.draw.circle(surface, (255, 0, 255), center, cursor_radius, 2)
+            pygame.draw.circle(surface, (255, 0, 255), center, 4)
+            self.cursor_sprite = (cursor_radius, self.texture_class.from_surface(
+                self.renderer, surface))
+        return self.cursor_sprite[1]
+
+
+def _sdl2_video():
+    import pygame._sdl2.video
+    return pygame._sdl2.video
+
+
+def create_texture_renderer(size, font, cell_size, colors, logical_size,
+                            title="Tetris"):
+    # Open a fullscreen window with an accelerated SDL2 renderer; returns
+    # None when pygame._sdl2 or hardware acceleration is unavailable, so
+    # the caller can fall back to the software Renderer.
+    try:
+        video = _sdl2_video()
+    except ImportError:
+        return None
+    try:
+        window = video.Window(title, size, fullscreen_desktop=True)
+    except (pygame.error, video.error):
+        return None
+    try:
+        renderer = video.Renderer(window, accelerated=1)
+    except (pygame.error, video.error):
+        window.destroy()
+        return None
+    return TextureRenderer(window, renderer, font, cell_size, colors, logical_size)
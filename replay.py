@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Deterministic session recording and playback.
+#
+# A Recorder stands in for the GameState a frontend drives: every game
+# operation (inputs from keys, swipes, dwell buttons or the assistant, and
+# gravity ticks) is forwarded to the game and appended to a compact binary
+# log.  Since pieces come from the game's seeded RNG, the seed plus that
+# log reproduce the session exactly.
+#
+# Log format, little endian:
+#   header  b'TTRP', version (B), seed (Q)
+#   record  time in ms since the start (I), action code (B)
+#
+# Replay headless at full speed:
+#   python replay.py session.ttr [more.ttr ...]
+# or rendered through the game at 1x-16x:
+#   python replay.py session.ttr --render --speed 4
+# Rendered replays feed the frame profiler identical input on every run:
+#   python replay.py session.ttr --render --profile frames.csv
+# and can be captured to video after the session, at no cost to it:
+#   python replay.py session.ttr --render --capture session.mp4
+
+import argparse
+import struct
+import sys
+import time
+
+from engine import GameState
+
+magic = b'TTRP'
+version = 1
+header_format = struct.Struct('<4sBQ')
+# The header, like the server's NEW message, holds the seed unsigned.
+max_seed = 2**64 - 1
+record_format = struct.Struct('<IB')
+
+MOVE_LEFT, MOVE_RIGHT, ROTATE, SOFT_DROP, HARD_DROP, TICK, TOGGLE_PAUSE, START_GAME = range(8)
+
+# How each action code is applied to a GameState.
+actions = {
+    MOVE_LEFT:    lambda game: game.move(-1),
+    MOVE_RIGHT:   lambda game: game.move(+1),
+    ROTATE:       lambda game: game.rotate(),
+    SOFT_DROP:    lambda game: game.soft_drop(),
+    HARD_DROP:    lambda game: game.hard_drop(),
+    TICK:         lambda game: game.tick(),
+    TOGGLE_PAUSE: lambda game: game.toggle_pause(),
+    START_GAME:   lambda game: game.start_game(),
+}
+
+
+class Recorder(object):
+    def __init__(self, game, stream, clock):
+        # clock() returns the current time in milliseconds.
+        if not 0 <= game.seed <= max_seed:
+            raise ValueError("seed %d does not fit in a replay log" % game.seed)
+        self.game = game
+        self.stream = stream
+        self.clock = clock
+        self.start = clock()
+        stream.write(header_format.pack(magic, version, game.seed))
+
+    def __getattr__(self, name):
+        return getattr(self.game, name)
+
+    def record(self, code):
+        self.stream.write(record_format.pack(self.clock() - self.start, code))
+
+    def move(self, delta_x):
+        self.record(MOVE_LEFT if delta_x < 0 else MOVE_RIGHT)
+        return self.game.move(delta_x)
+
+    def rotate(self):
+        self.record(ROTATE)
+        return self.game.rotate()
+
+    def soft_drop(self):
+        self.record(SOFT_DROP)
+        return self.game.soft_drop()
+
+    def hard_drop(self):
+        self.record(HARD_DROP)
+        return self.game.hard_drop()
+
+    def tick(self):
+        self.record(TICK)
+        return self.game.tick()
+
+    def toggle_pause(self):
+        self.record(TOGGLE_PAUSE)
+        return self.game.toggle_pause()
+
+    def start_game(self):
+        self.record(START_GAME)
+        return self.game.start_game()
+
+    def close(self):
+        self.stream.close()
+
+
+def read_log(stream):
+    # Returns (seed, [(time_ms, action_code), ...]).
+    header = stream.read(header_format.size)
+    if len(header) < header_format.size:
+        raise ValueError("truncated replay header")
+    log_magic, log_version, seed = header_format.unpack(header)
+    if log_magic != magic or log_version != version:
+        raise ValueError("not a version %d replay log" % version)
+    data = stream.read()
+    usable = len(data) - len(data) % record_format.size
+    return seed, list(record_format.iter_unpack(data[:usable]))
+
+
+def play(seed, records, board_backend='bitboard'):
+    # Re-run a log headless as fast as possible and return the game.
+    game = GameState(seed, board_backend)
+    for _, code in records:
+        actions[code](game)
+    return game
+
+
+class Player(object):
+    # Feeds a log to a live game at a given speed; used by the rendered
+    # replay in TetrisApp.
+    def __init__(self, records, speed, clock):
+        self.records = records
+        self.speed = speed
+        self.clock = clock
+        self.start = clock()
+        self.position = 0
+
+    @property
+    def finished(self):
+        return self.position >= len(self.records)
+
+    def log_time(self):
+        return (self.clock() - self.start) * self.speed
+
+    def apply_due(self, game):
+        # Apply every record whose time has come; returns how many.
+        now = self.log_time()
+        start = self.position
+        records = self.records
+        while self.position < len(records) and records[self.position][0] <= now:
+            actions[records[self.position][1]](game)
+            self.position += 1
+        return self.position - start
+
+    def next_due_in(self):
+        # Wall-clock milliseconds until the next record is due.
+        if self.finished:
+            return None
+        wait = (self.records[self.position][0] - self.log_time()) / self.speed
+        return max(int(wait), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded sessions")
+    parser.add_argument('logs', nargs='+', metavar='LOG')
+    parser.add_argument('--render', action='store_true',
+                        help="show the replay in the game window")
+    parser.add_argument('--speed', type=int, default=1, choices=range(1, 17),
+                        metavar='1-16', help="playback speed when rendering")
+    parser.add_argument('--profile', metavar='PATH', default=None,
+                        help="when rendering, write per-frame timings to PATH "
+                             "(.csv or .json)")
+    parser.add_argument('--capture', metavar='PATH', default=None,
+                        help="when rendering, record video to PATH (see tetris.py --capture)")
+    args = parser.parse_args()
+
+    if args.render:
+        if len(args.logs) != 1:
+            parser.error("--render shows one log at a time")
+        import tetris
+        with open(args.logs[0], 'rb') as stream:
+            seed, records = read_log(stream)
+        tetris.TetrisApp(seed=seed, replay=records, replay_speed=args.speed,
+                         profile_path=args.profile, capture=args.capture).run()
+        return 0
+
+    for path in args.logs:
+        with open(path, 'rb') as stream:
+            seed, records = read_log(stream)
+        start = time.perf_counter()
+        game = play(seed, records)
+        print("%s: seed %d, %d records, score %d, lines %d, level %d%s (%.1f ms)"
+              % (path, seed, len(records), game.score, game.lines, game.level,
+                 ", game over" if game.gameover else "",
+                 (time.perf_counter() - start) * 1e3))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Fixed-timestep logic scheduler.
+#
+# Game logic advances in ticks of a fixed length instead of whenever the
+# main loop gets around to it.  Each time the loop wakes up, the elapsed
+# wall time is paid out of an accumulator as a whole number of ticks,
+# each stamped with the time it stands for; gravity, held soft drops and
+# dwell timers count in those ticks, so a slow frame makes the next one
+# run several ticks rather than delaying or merging drops, and the game
+# plays the same at any frame rate.  The loop tells the scheduler how
+# long it means to sleep; when it wakes up later than that (a stalled
+# machine), at most max_catch_up of the overdue ticks run and the rest
+# of the time is skipped rather than replayed all at once.
+#
+# Ticks are virtual: the loop still sleeps until the next tick at which
+# something is scheduled to happen.
+
+import math
+
+
+class TickTimer(object):
+    # Fires every period milliseconds of logic time, stepped once per tick
+    # of step_ms; a stopped timer never fires.  Periods that are not a
+    # whole number of ticks carry the remainder over, so they are kept on
+    # average: 25 ms at 10 ms per tick fires at 30, 50, 80, 100, ...
+    def __init__(self, step_ms):
+        self.step_ms = step_ms
+        self.period = None
+        self.elapsed = 0.0
+
+    def start(self, period, first=None):
+        # first, when given, is the delay before the first firing.
+        self.period = period
+        self.elapsed = period - (first if first is not None else period)
+
+    def stop(self):
+        self.period = None
+
+    @property
+    def running(self):
+        return self.period is not None
+
+    def step(self):
+        if self.period is None:
+            return False
+        self.elapsed += self.step_ms
+        if self.elapsed >= self.period - 1e-6:
+            self.elapsed -= self.period
+            return True
+        return False
+
+    def remaining(self):
+        # Ticks until the next firing.
+        if self.period is None:
+            return None
+        return max(int(math.ceil((self.period - self.elapsed) / self.step_ms - 1e-6)), 1)
+
+
+class LogicScheduler(object):
+    def __init__(self, tick_rate=100, max_catch_up=25):
+        self.tick_rate = tick_rate
+        self.step_ms = 1000.0 / tick_rate
+        self.max_catch_up = max_catch_up
+        self.next_tick = None
+        self.planned = None
+        self.ticks = 0
+        self.skipped_ms = 0.0
+
+    def timer(self):
+        return TickTimer(self.step_ms)
+
+    def plan(self, delay, now):
+        # The loop is about to sleep for up to delay ms.  Ticks up to the
+        # planned wakeup are time it chose to skip, not a stall, so the
+        # catch-up cap only applies to a wakeup later than that.
+        self.planned = now + delay
+
+    def due(self, now):
+        # Yield the (integer ms) time of every tick due by now, oldest
+        # first; at most max_catch_up of them past the planned wakeup.
+        if self.next_tick is None:
+            self.next_tick = float(now)
+        planned, self.planned = self.planned, None
+        late = 0
+        while self.next_tick <= now:
+            if planned is None or self.next_tick > planned:
+                if late == self.max_catch_up:
+                    behind = now - self.next_tick
+                    skipped = (int(behind // self.step_ms) + 1) * self.step_ms
+                    self.skipped_ms += skipped
+                    self.next_tick += skipped
+                    break
+                late += 1
+            yield int(self.next_tick)
+            self.next_tick += self.step_ms
+            self.ticks += 1
+
+    def wake_in(self, delay, now):
+        # Wall time until the first tick at or after now + delay ms.
+        if self.next_tick is None:
+            return max(int(delay), 1)
+        ticks = max(0, -int(-(now + delay - self.next_tick) // self.step_ms))
+        return max(int(self.next_tick + ticks * self.step_ms - now) + 1, 1)
+
+    def ms_until(self, ticks, now):
+        # Wall time until `ticks` more ticks have run, for sleeping.
+        if ticks is None or self.next_tick is None:
+            return None
+        return max(int(self.next_tick + (ticks - 1) * self.step_ms - now) + 1, 1)
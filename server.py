@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Multi-session game server.
+#
+# Runs any number of independent games (engine.GameState, so the same
+# rules as the local game) in one asyncio process.  Clients connect over
+# a local socket, start sessions or watch existing ones, and send input
+# actions; gravity is driven by the server's fixed-timestep scheduler.
+# After every tick in which a session changed, its subscribers get one
+# update holding only the board rows that differ from the previous
+# update, plus the falling piece, the next piece and the score.  A
+# subscriber whose socket falls behind is skipped and sent a keyframe
+# with every row once its buffer has drained.
+#
+# Wire format, little endian; every message is its length (H) followed
+# by the body, whose first byte is the message type:
+#   client -> server
+#     NEW     has_seed (B), seed (Q)        start a session and play it
+#     WATCH   session (I)                   follow a session read-only
+#     ACTION  session (I), seq (I), code (B) replay.py action code
+#     STATS                                 ask for tick timing
+#   server -> client
+#     WELCOME session (I), seed (Q)
+#     UPDATE  session (I), tick (I), ack (I), score (I), lines (H),
+#             level (H), flags (B), kind (B), rotation (B), x (b), y (b),
+#             next kind (B), row count (B), then per row: y (B) and one
+#             color byte per column
+#     ERROR   session (I), error code (B)
+#     CLOSED  session (I)                   the player left
+#     STATS   ticks (I), sessions (I), subscribers (I), tick latency
+#             p50, p99 and max in ms (3f)
+# ack is the seq of the last action applied to the session.  A session
+# ends when the connection that started it closes.
+#
+#   python server.py [--listen HOST:PORT | --listen PATH] [--tick-rate HZ]
+
+import argparse
+import asyncio
+import os
+import random
+import struct
+import sys
+import time
+from collections import deque
+
+from board import BACKENDS, cols, rows
+from engine import GameState
+from replay import TICK, actions
+from scheduler import LogicScheduler
+
+default_address = '127.0.0.1:7470'
+tick_rate = 100
+max_catch_up_ticks = 25
+# Bytes a subscriber may have queued before updates to it are skipped.
+max_buffered = 64 * 1024
+
+NEW, WATCH, ACTION, STATS = 1, 2, 3, 4
+WELCOME, UPDATE, ERROR, CLOSED = 16, 17, 18, 19
+
+UNKNOWN_SESSION, NOT_OWNER, BAD_MESSAGE = 1, 2, 3
+
+GAMEOVER, PAUSED, KEYFRAME = 1, 2, 4
+
+length_format = struct.Struct('<H')
+new_format = struct.Struct('<BBQ')
+watch_format = struct.Struct('<BI')
+action_format = struct.Struct('<BIIB')
+welcome_format = struct.Struct('<BIQ')
+update_format = struct.Struct('<BIIIIHHBBBbbBB')
+error_format = struct.Struct('<BIB')
+closed_format = struct.Struct('<BI')
+stats_format = struct.Struct('<BIIIfff')
+row_size = 1 + cols
+
+
+def frame(body):
+    return length_format.pack(len(body)) + body
+
+
+def parse_address(address):
+    # HOST:PORT for TCP, anything else is the path of a Unix socket.
+    host, _, port = address.rpartition(':')
+    if host and port.isdigit():
+        return host, int(port)
+    return address
+
+
+def read_update(body):
+    # The header fields of an UPDATE body and its rows as [(y, colors)].
+    fields = update_format.unpack_from(body)
+    return fields, [(body[i], body[i + 1:i + row_size])
+                    for i in range(update_format.size, len(body), row_size)]
+
+
+async def read_message(reader):
+    length, = length_format.unpack(await reader.readexactly(length_format.size))
+    return await reader.readexactly(length)
+
+
+class Subscriber(object):
+    def __init__(self, writer):
+        self.writer = writer
+        # Sessions whose next update to this subscriber must be a
+        # keyframe: just joined, or updates were skipped.
+        self.stale = set()
+
+    def send(self, data):
+        self.writer.write(data)
+
+    def backlogged(self):
+        return self.writer.transport.get_write_buffer_size() > max_buffered
+
+
+class Session(object):
+    def __init__(self, session_id, seed, owner, board_backend, logic):
+        self.id = session_id
+        self.game = GameState(seed, board_backend)
+        self.owner = owner
+        self.logic = logic
+        self.gravity = logic.timer()
+        self.subscribers = [owner]
+        self.ack = 0
+        self.dirty = True
+        # What the subscribers were last sent: one bytes object per row
+        # and the rest of the update header.
+        self.rows = [None] * rows
+        self.header = None
+
+    def apply(self, seq, code):
+        actions[code](self.game)
+        self.ack = seq
+        self.dirty = True
+
+    def step(self):
+        # One logic tick: gravity, as TetrisApp.logic_tick does it.
+        game = self.game
+        delay = game.gravity_delay
+        if delay != self.gravity.period:
+            self.gravity.start(delay)
+        if self.gravity.step() and not game.gameover and not game.paused:
+            game.tick()
+            self.dirty = True
+
+    def state(self, tick, changed_rows, keyframe=False):
+        game = self.game
+        stone = game.stone
+        flags = ((GAMEOVER if game.gameover else 0) | (PAUSED if game.paused else 0)
+                 | (KEYFRAME if keyframe else 0))
+        return (update_format.pack(UPDATE, self.id, tick, self.ack, game.score,
+                                   game.lines, game.level, flags, stone.kind,
+                                   stone.rotation, game.stone_x, game.stone_y,
+                                   game.next_stone.kind, len(changed_rows))
+                + b''.join(bytes((y,)) + self.rows[y] for y in changed_rows))
+
+    def delta(self, tick):
+        # The update since the last one, or None when nothing changed.
+        self.dirty = False
+        changed = []
+        for y, row in enumerate(self.game.cells()[:rows]):
+            row = bytes(row)
+            if row != self.rows[y]:
+                self.rows[y] = row
+                changed.append(y)
+        header = self.state(0, ())[9:]
+        if not changed and header == self.header:
+            return None
+        self.header = header
+        return frame(self.state(tick, changed))
+
+    def keyframe(self, tick):
+        return frame(self.state(tick, range(rows), keyframe=True))
+
+
+class GameServer(object):
+    def __init__(self, tick_rate=tick_rate, board_backend='bitboard',
+                 clock=time.monotonic):
+        self.logic = LogicScheduler(tick_rate, max_catch_up_ticks)
+        self.board_backend = board_backend
+        self.clock = clock
+        self.sessions = {}
+        self.next_id = 1
+        # Milliseconds from when each recent tick was due until its
+        # updates were written.
+        self.latency = deque(maxlen=1000)
+
+    def now(self):
+        return self.clock() * 1e3
+
+    def open_session(self, subscriber, seed):
+        session = Session(self.next_id, seed, subscriber, self.board_backend,
+                          self.logic)
+        self.sessions[session.id] = session
+        self.next_id += 1
+        return session
+
+    def close_sessions(self, subscriber):
+        # Drop a closed connection from every session it was in; sessions
+        # it played end and their watchers are told.
+        for session in list(self.sessions.values()):
+            if session.owner is subscriber:
+                del self.sessions[session.id]
+                for watcher in session.subscribers:
+                    if watcher is not subscriber:
+                        watcher.send(frame(closed_format.pack(CLOSED, session.id)))
+            elif subscriber in session.subscribers:
+                session.subscribers.remove(subscriber)
+
+    def handle(self, subscriber, body):
+        kind = body[0]
+        if kind == ACTION:
+            _, session_id, seq, code = action_format.unpack(body)
+            session = self.sessions.get(session_id)
+            if session is None:
+                subscriber.send(frame(error_format.pack(ERROR, session_id, UNKNOWN_SESSION)))
+            elif session.owner is not subscriber:
+                subscriber.send(frame(error_format.pack(ERROR, session_id, NOT_OWNER)))
+            elif code in actions and code != TICK:
+                session.apply(seq, code)
+            else:
+                subscriber.send(frame(error_format.pack(ERROR, session_id, BAD_MESSAGE)))
+        elif kind == NEW:
+            _, has_seed, seed = new_format.unpack(body)
+            if not has_seed:
+                seed = random.SystemRandom().randrange(2**32)
+            session = self.open_session(subscriber, seed)
+            subscriber.send(frame(welcome_format.pack(WELCOME, session.id, seed)))
+            subscriber.stale.add(session.id)
+        elif kind == WATCH:
+            _, session_id = watch_format.unpack(body)
+            session = self.sessions.get(session_id)
+            if session is None:
+                subscriber.send(frame(error_format.pack(ERROR, session_id, UNKNOWN_SESSION)))
+                return
+            subscriber.send(frame(welcome_format.pack(WELCOME, session.id,
+                                                      session.game.seed)))
+            if subscriber not in session.subscribers:
+                session.subscribers.append(subscriber)
+            # A new watcher has none of the rows yet.
+            subscriber.stale.add(session.id)
+        elif kind == STATS:
+            subscriber.send(frame(self.stats()))
+        else:
+            subscriber.send(frame(error_format.pack(ERROR, 0, BAD_MESSAGE)))
+
+    def stats(self):
+        ordered = sorted(self.latency) or [0.0]
+        return stats_format.pack(
+            STATS, self.logic.ticks, len(self.sessions),
+            sum(len(session.subscribers) for session in self.sessions.values()),
+            ordered[len(ordered) // 2], ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)],
+            ordered[-1])
+
+    def tick(self, due):
+        tick = self.logic.ticks
+        for session in self.sessions.values():
+            session.step()
+            update = session.delta(tick) if session.dirty else None
+            for subscriber in session.subscribers:
+                if subscriber.backlogged():
+                    subscriber.stale.add(session.id)
+                elif session.id in subscriber.stale:
+                    subscriber.stale.discard(session.id)
+                    subscriber.send(session.keyframe(tick))
+                elif update is not None:
+                    subscriber.send(update)
+        self.latency.append(self.now() - due)
+
+    async def serve_client(self, reader, writer):
+        subscriber = Subscriber(writer)
+        try:
+            while True:
+                body = await read_message(reader)
+                if body:
+                    try:
+                        self.handle(subscriber, body)
+                    except struct.error:
+                        subscriber.send(frame(error_format.pack(ERROR, 0, BAD_MESSAGE)))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.close_sessions(subscriber)
+            writer.close()
+
+    async def run_ticks(self):
+        logic = self.logic
+        while True:
+            for due in logic.due(self.now()):
+                self.tick(due)
+            now = self.now()
+            delay = logic.ms_until(1, now)
+            logic.plan(delay, now)
+            await asyncio.sleep(delay / 1e3)
+
+    async def serve(self, address, ready=None):
+        address = parse_address(address)
+        if isinstance(address, tuple):
+            server = await asyncio.start_server(self.serve_client, *address)
+        else:
+            if os.path.exists(address):
+                os.unlink(address)
+            server = await asyncio.start_unix_server(self.serve_client, address)
+        if ready is not None:
+            ready(server)
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.run_ticks())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve tetris sessions over a local socket")
+    parser.add_argument('--listen', default=default_address, metavar='ADDRESS',
+                        help="HOST:PORT or the path of a Unix socket (default: %s)"
+                             % default_address)
+    parser.add_argument('--tick-rate', type=int, default=tick_rate, metavar='HZ',
+                        help="logic ticks per second (default: %d)" % tick_rate)
+    parser.add_argument('--board', choices=BACKENDS, default='bitboard',
+                        help="board backend (default: bitboard)")
+    args = parser.parse_args()
+
+    server = GameServer(args.tick_rate, args.board)
+
+    def ready(listener):
+        print("listening on", ", ".join(str(sock.getsockname()) for sock in listener.sockets),
+              flush=True)
+
+    try:
+        asyncio.run(server.serve(args.listen, ready))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
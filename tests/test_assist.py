@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import Future
+
+from assist import Assistant, footprint
+from engine import GameState
+
+
+def test_apply_places_the_stone():
+    game = GameState(3)
+    assistant = Assistant(3)
+    assistant.update(game)
+    placement = assistant.suggestions[0]
+    assistant.apply(game, 0)
+    assert [list(row) for row in game.cells()] == [list(row) for row in placement.cells]
+
+
+def test_stale_suggestions_are_ignored():
+    game = GameState(3)
+    assistant = Assistant(3)
+    assistant.update(game)
+    game.tick()
+    y = game.stone_y
+    assistant.apply(game, 0)
+    assert game.stone_y == y
+    assert not any(cell for row in game.cells()[:-1] for cell in row)
+    assistant.update(game)
+    assistant.apply(game, 0)
+    assert any(cell for row in game.cells()[:-1] for cell in row)
+
+
+class ManualPool(object):
+    # Runs a submitted search only when the test says it finished.
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, function, *args):
+        future = Future()
+        self.jobs.append((future, function, args))
+        return future
+
+    def finish(self):
+        for future, function, args in self.jobs:
+            if not future.cancelled():
+                future.set_result(function(*args))
+        self.jobs = []
+
+
+def lookahead_assistant():
+    assistant = Assistant(3)
+    assistant.pool = ManualPool()
+    return assistant
+
+
+def shown(assistant):
+    return [footprint(placement.piece, placement.x, placement.y)
+            for placement in assistant.suggestions]
+
+
+def placements_by_footprint(assistant, cells):
+    for placement in assistant.ranked:
+        if footprint(placement.piece, placement.x, placement.y) == cells:
+            return placement.cells
+
+
+def test_gravity_keeps_the_lookahead_ranking():
+    for seed in range(15):
+        game = GameState(seed)
+        assistant = lookahead_assistant()
+        assistant.update(game)
+        assistant.pool.finish()
+        assert assistant.update(game)
+        ranked = shown(assistant)
+        game.tick()
+        assistant.update(game)
+        # One search per stone, and the same placements in the same order.
+        assert assistant.pending is None and not assistant.pool.jobs
+        assert shown(assistant) == ranked
+        # The paths are for the new position.
+        assistant.apply(game, 0)
+        assert [list(row) for row in game.cells()] == [
+            list(row) for row in placements_by_footprint(assistant, ranked[0])]
+
+
+def test_order_is_kept_while_the_search_runs():
+    game = GameState(4)
+    assistant = lookahead_assistant()
+    assistant.update(game)
+    before = shown(assistant)
+    game.tick()
+    game.tick()
+    assistant.update(game)
+    assert shown(assistant) == before
+    assert len(assistant.pool.jobs) == 1
+    assistant.pool.finish()
+    assistant.update(game)
+    assert assistant.scores is not None
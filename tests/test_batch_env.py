@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+# BatchTetris against the scalar engine: every board is replayed through
+# an engine.GameState fed the same piece sequence and actions, and must
+# agree on board, stone, score, lines, level and game over at every step.
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from batch_env import (HARD_DROP, LEFT, NOOP, RIGHT, ROTATE, SOFT_DROP,  # noqa: E402
+                       TICK, BatchTetris, actions)
+from board import cols, rows  # noqa: E402
+from engine import GameState  # noqa: E402
+
+garbage_rows = 8
+
+
+class FeedRandom(object):
+    # Stands in for GameState.rng and hands out the batch's piece draws.
+    def __init__(self, queue):
+        self.queue = queue
+
+    def randrange(self, n):
+        return self.queue.pop(0)
+
+
+def apply(game, action):
+    if action == LEFT:
+        game.move(-1)
+    elif action == RIGHT:
+        game.move(+1)
+    elif action == ROTATE:
+        game.rotate()
+    elif action == SOFT_DROP:
+        game.soft_drop()
+    elif action == HARD_DROP:
+        game.hard_drop()
+    elif action == TICK:
+        game.tick()
+
+
+def mismatch(env, i, game):
+    if game.gameover != env.gameover[i]:
+        return "gameover"
+    if game.gameover:
+        return None
+    if (np.array(game.cells(), dtype=np.uint8) != env.boards[i]).any():
+        return "board"
+    if (game.stone.kind, game.stone.rotation, game.stone_x, game.stone_y) != (
+            env.kind[i], env.rotation[i], env.x[i], env.y[i]):
+        return "stone"
+    if (game.score, game.lines, game.level) != (
+            env.score[i], env.lines[i], env.level[i]):
+        return "score"
+    return None
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_batch_matches_scalar_engine(seed):
+    boards, steps = 128, 400
+    env = BatchTetris(boards, seed=seed)
+    games = [GameState(rng=FeedRandom([int(env.kind[i]), int(env.next_kind[i])]))
+             for i in range(boards)]
+    rng = np.random.default_rng(seed + 1)
+
+    # Start from a stack of rows with a single-column well so that random
+    # play clears lines, including multi-line clears.
+    wells = rng.integers(0, cols, size=boards)
+    for y in range(rows - garbage_rows, rows):
+        env.boards[:, y] = 8
+        env.boards[np.arange(boards), y, wells] = 0
+    for i, game in enumerate(games):
+        for y in range(rows - garbage_rows, rows):
+            game.board[y] = [int(cell) for cell in env.boards[i, y]]
+    for step in range(steps):
+        # Weighted towards movement so stacks get ragged and lines clear.
+        action = rng.choice([NOOP, LEFT, RIGHT, ROTATE, SOFT_DROP, HARD_DROP, TICK],
+                            size=boards, p=[0.05, 0.2, 0.2, 0.2, 0.1, 0.1, 0.15])
+        env.step(action)
+        for i, game in enumerate(games):
+            if game.gameover:
+                continue
+            # A lock draws exactly one piece: the batch's new next piece.
+            game.rng.queue = [int(env.next_kind[i])]
+            apply(game, action[i])
+            problem = mismatch(env, i, game)
+            assert problem is None, "board %d diverges at step %d (%s, action %s)" % (
+                i, step, problem, actions[action[i]])
+    # The run must have exercised line clears and game overs.
+    assert env.lines.sum() > 0
+    assert env.gameover.any()
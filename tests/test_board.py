@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+from board import cols, get_backend
+from pieces import piece_table
+
+square = piece_table[6][0]
+
+
+def test_skyline_landing_matches_the_list_backend():
+    # Random stacks of squares with holes and overhangs; every piece from
+    # every free spot near the top must land where stepping puts it.
+    reference, bitboard = get_backend('list'), get_backend('bitboard')
+    rng = random.Random(5)
+    for _ in range(40):
+        boards = [reference.new_board(), bitboard.new_board()]
+        for _ in range(rng.randrange(10, 40)):
+            x, y = rng.randrange(cols - 1), rng.randrange(8, 22)
+            boards = [backend.join_matrixes(board, square, (x, y + 1))
+                      for backend, board in zip((reference, bitboard), boards)]
+        for rotations in piece_table:
+            for piece in rotations:
+                for x in range(cols - piece.width + 1):
+                    for y in range(0, 8):
+                        if reference.check_collision(boards[0], piece, (x, y)):
+                            continue
+                        assert (bitboard.landing_y(boards[1], piece, x, y)
+                                == reference.landing_y(boards[0], piece, x, y))
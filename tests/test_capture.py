@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+import pygame
+
+from capture import FrameCapture, PngWriter, overhead_window
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class Source(object):
+    # Stands in for Renderer.capture_source and counts the readbacks.
+    def __init__(self, shows_cursor=False):
+        self.calls = 0
+        self.shows_cursor = shows_cursor
+
+    def __call__(self):
+        self.calls += 1
+        return pygame.Surface((8, 6), 0, 32), self.shows_cursor
+
+
+class Writer(object):
+    def __init__(self, error=None):
+        self.error = error
+        self.frames = []
+        self.writing = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def write(self, t, surface):
+        self.writing.set()
+        self.release.wait()
+        if self.error is not None:
+            raise self.error
+        self.frames.append(t)
+
+    def close(self):
+        pass
+
+
+def test_early_frames_are_skipped_without_a_readback():
+    clock, source, writer = Clock(), Source(), Writer()
+    capture = FrameCapture(writer, fps=25, clock=clock)
+    assert capture.offer(source)
+    clock.now = 10
+    assert not capture.offer(source)
+    assert source.calls == 1
+    # The skipped frame is still on screen; the loop must come back for it.
+    assert capture.missed
+    assert capture.next_due_in(clock.now) == 31
+    clock.now = 40
+    assert capture.offer(source)
+    assert not capture.missed
+    assert capture.next_due_in(clock.now) is None
+    capture.close()
+    assert writer.frames == [0, 40]
+    assert capture.captured == capture.written == 2
+
+
+def test_full_queue_drops_without_a_readback():
+    clock, source, writer = Clock(), Source(), Writer()
+    writer.release.clear()
+    capture = FrameCapture(writer, fps=25, queue_size=1, clock=clock)
+    assert capture.offer(source)
+    # The worker holds the first frame, the second fills the queue.
+    assert writer.writing.wait(5)
+    clock.now = 40
+    assert capture.offer(source)
+    clock.now = 80
+    assert not capture.offer(source)
+    assert source.calls == 2
+    assert capture.dropped == 1
+    assert capture.missed
+    assert capture.next_due_in(clock.now) == 41
+    writer.release.set()
+    capture.close()
+    assert writer.frames == [0, 40]
+    assert "1 dropped" in capture.report()
+
+
+def test_writer_error_stops_capture():
+    clock, source, writer = Clock(), Source(), Writer(OSError("disk full"))
+    capture = FrameCapture(writer, fps=25, clock=clock)
+    assert capture.offer(source)
+    clock.now = 40
+    capture.offer(source)
+    capture.close()
+    assert isinstance(capture.error, OSError)
+    assert capture.written == 0
+    # Once the writer failed nothing more is read back or waited for.
+    clock.now = 80
+    calls = source.calls
+    assert not capture.offer(source)
+    assert source.calls == calls
+    assert capture.next_due_in(clock.now) is None
+    assert "stopped writing: disk full" in capture.report()
+
+
+def test_pointer_is_drawn_only_when_the_frame_lacks_it():
+    clock, writer = Clock(), Writer()
+    drawn = []
+    writer.write = lambda t, surface: drawn.append(surface.get_at((4, 3))[:3])
+    capture = FrameCapture(writer, fps=25, clock=clock)
+    capture.offer(Source(), ((4, 3), 2))
+    clock.now = 40
+    capture.offer(Source(shows_cursor=True), ((4, 3), 2))
+    capture.close()
+    assert drawn == [(255, 0, 255), (0, 0, 0)]
+
+
+def test_png_writer_frames_load_back(tmp_path):
+    surface = pygame.Surface((5, 3), 0, 32)
+    surface.fill((10, 20, 30))
+    surface.set_at((4, 2), (200, 100, 50))
+    writer = PngWriter(str(tmp_path), 30)
+    writer.write(0, surface)
+    writer.close()
+    loaded = pygame.image.load(str(tmp_path / 'frame_000000.png'))
+    assert loaded.get_size() == (5, 3)
+    assert loaded.get_at((0, 0))[:3] == (10, 20, 30)
+    assert loaded.get_at((4, 2))[:3] == (200, 100, 50)
+
+
+def test_overhead_is_bounded():
+    clock, source, writer = Clock(), Source(), Writer()
+    capture = FrameCapture(writer, fps=25, queue_size=2000, clock=clock)
+    for i in range(overhead_window + 500):
+        clock.now = 40 * i
+        assert capture.offer(source)
+    capture.close()
+    assert len(capture.overhead) == overhead_window
+    mean, p99 = capture.overhead_ms()
+    assert 0 < mean <= p99 * 10
+    assert capture.written == overhead_window + 500
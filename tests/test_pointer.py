@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+import pygame
+
+from pointer import PointerPipeline, SwipeDetector, TraceSource, save_trace
+from widgets import DwellButton, WidgetLayer
+
+
+def test_trace_replay_swipes_and_dwells(tmp_path):
+    # A fast swipe to the right that crosses the swipe area between two
+    # samples, a slower one up, a move around the area and a rest on a
+    # button that sends no more samples once the pointer stops.
+    samples = [(0, 20, 150), (16, 260, 150),
+               (100, 150, 250), (200, 150, 150), (300, 150, 90),
+               (400, 300, 50), (500, 410, 410), (516, 420, 420)]
+    path = str(tmp_path / 'trace.csv')
+    save_trace(path, samples)
+    pipeline = PointerPipeline(TraceSource.load(path),
+                               swipe=SwipeDetector(pygame.Rect(100, 100, 100, 100), 50))
+    fired = []
+    layer = WidgetLayer([DwellButton((400, 400, 50, 50), lambda: fired.append(now),
+                                     "Go", (0, 0), "Going", (0, 0), (0, 0))])
+
+    swipes = []
+    for now in range(1000, 6000, 10):
+        new_samples, new_swipes = pipeline.update(now)
+        for t, pos in new_samples:
+            layer.update(pos, t)
+        layer.update(pipeline.position, now)
+        swipes += new_swipes
+
+    # The trace starts at the first poll, 1000.
+    assert swipes == [(1016, 'right'), (1300, 'up')]
+    assert pipeline.position == (420, 420)
+    # Four whole one second steps after the pointer arrived at 1500.
+    assert fired == [5500]
+    assert not pipeline.pending
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import json
+
+from profiler import FrameProfiler, fields, stages
+
+
+def run_frames(profiler, pattern, draw_ms):
+    # Iterations that render spend draw_ms in 'draw', the others nothing.
+    for rendered in pattern:
+        profiler.start()
+        profiler.current['draw'] = draw_ms if rendered else 0.0
+        profiler.end_frame(rendered)
+
+
+def test_window_holds_only_recent_rendered_frames():
+    profiler = FrameProfiler(60, window=10)
+    run_frames(profiler, [True, False, False] * 100, 4.0)
+    assert len(profiler.window) == 10
+    assert profiler.rendered == 100
+    assert profiler.count == 300
+    # Idle iterations do not dilute the overlay's stage means.
+    means = profiler.overlay_lines()[2]
+    assert "draw 4.00" in means
+    assert profiler.stats()['p50'] == 4.0
+
+
+def test_frames_stream_to_csv(tmp_path):
+    path = str(tmp_path / 'frames.csv')
+    profiler = FrameProfiler(60, window=5, path=path)
+    run_frames(profiler, [True, False] * 20, 20.0)
+    profiler.close()
+    with open(path, newline='') as stream:
+        rows = list(csv.reader(stream))
+    assert tuple(rows[0]) == fields
+    assert len(rows) == 41
+    assert [int(row[-2]) for row in rows[1:4]] == [1, 0, 1]
+    assert sum(int(row[-1]) for row in rows[1:]) == 20
+
+
+def test_frames_stream_to_json(tmp_path):
+    path = str(tmp_path / 'frames.json')
+    profiler = FrameProfiler(60, window=5, path=path)
+    run_frames(profiler, [True, False] * 20, 2.0)
+    profiler.close()
+    with open(path) as stream:
+        data = json.load(stream)
+    assert len(data['frames']) == 40
+    assert data['frames'][2]['frame'] == 2
+    assert set(stages) <= set(data['frames'][0])
+    assert data['stats']['frames'] == 20
+    assert data['stats']['dropped'] == 0
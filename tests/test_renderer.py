@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+import pygame
+
+from renderer import Renderer
+
+magenta = (255, 0, 255)
+
+
+def test_scaled_copy_keeps_the_cursor():
+    pygame.display.init()
+    screen = pygame.display.set_mode((1000, 750))
+    renderer = Renderer(screen, None, 20, [(0, 0, 0), (200, 0, 0), (255, 255, 255)],
+                        (400, 300))
+    assert renderer.scaled
+    sprite = renderer.cell_sprite(1)
+    cursor = (200, 150)
+    screen_cursor = (500, 375)
+
+    renderer.begin('playing', lambda surface: surface.fill((0, 0, 0)))
+    renderer.present(cursor, 10)
+    assert screen.get_at(screen_cursor)[:3] == magenta
+
+    # Cells change left and right of the resting cursor; the dirty rects
+    # miss it, but the single scaled copy spans it.
+    renderer.begin('playing', None)
+    renderer.blit(sprite, (20, 140))
+    renderer.blit(sprite, (360, 140))
+    dirty = renderer.present(cursor, 10)
+    assert all(not rect.collidepoint(cursor) for rect in dirty)
+    assert screen.get_at(screen_cursor)[:3] == magenta
+    pygame.display.quit()
+
+
+def test_native_resolution_cells_are_whole_pixels(monkeypatch):
+    import tetris
+    monkeypatch.setattr(tetris, 'primary_display_size', lambda: (1920, 1200))
+    app = tetris.TetrisApp(seed=1, native_resolution=True)
+    cell_size, llim = app.cell_size, app.llim
+    assert (cell_size, llim) == (50, 460)
+    renderer = app.renderer
+    renderer.begin('playing', app.build_playing_layer)
+    app.draw_matrix([[1] * tetris.cols] * 2, (0, 3))
+    lefts = sorted({pos[0] for _, pos in renderer.items})
+    tops = sorted({pos[1] for _, pos in renderer.items})
+    assert lefts == [llim + x * cell_size for x in range(tetris.cols)]
+    assert tops == [4 * cell_size, 5 * cell_size]
+    # The background grid lines up with the cells, inside the frame.
+    layer = renderer.layers['playing']
+    assert layer.get_at((llim - 1, cell_size * 2))[:3] == (255, 255, 255)
+    assert layer.get_at((llim, cell_size * 2))[:3] != (255, 255, 255)
+    pygame.display.quit()
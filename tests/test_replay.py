@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+import io
+
+import pytest
+
+from engine import GameState
+from replay import Recorder, max_seed, play, read_log
+
+
+class Stream(io.BytesIO):
+    def close(self):
+        pass
+
+
+def test_round_trip_with_the_largest_seed():
+    stream = Stream()
+    recorder = Recorder(GameState(max_seed), stream, lambda: 0)
+    for _ in range(3):
+        recorder.hard_drop()
+    recorder.close()
+    seed, records = read_log(io.BytesIO(stream.getvalue()))
+    assert seed == max_seed
+    assert play(seed, records).cells() == recorder.cells()
+
+
+@pytest.mark.parametrize('seed', [-1, max_seed + 1])
+def test_seed_out_of_range_is_refused(seed):
+    with pytest.raises(ValueError):
+        Recorder(GameState(seed), Stream(), lambda: 0)
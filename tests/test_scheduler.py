@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+from engine import GameState
+from scheduler import LogicScheduler
+
+
+def idle_loop(seconds, oversleep=0):
+    # TetrisApp's loop with no input: run the due ticks, then sleep until
+    # gravity is next due, waking oversleep ms late.
+    logic = LogicScheduler(100, 25)
+    gravity = logic.timer()
+    game = GameState(1)
+    drops = []
+    now = 0
+    while now < seconds * 1000:
+        for tick in logic.due(now):
+            if game.gravity_delay != gravity.period:
+                gravity.start(game.gravity_delay)
+            if gravity.step():
+                game.tick()
+                drops.append(tick)
+        delay = logic.ms_until(gravity.remaining(), now)
+        logic.plan(delay, now)
+        now += delay + oversleep
+    return logic, drops
+
+
+def test_planned_sleep_is_not_capped():
+    logic, drops = idle_loop(10)
+    assert len(drops) == 10
+    assert [b - a for a, b in zip(drops, drops[1:])] == [1000] * 9
+    assert logic.skipped_ms == 0
+
+
+def test_late_wakeup_is_capped():
+    logic = LogicScheduler(100, 25)
+    list(logic.due(0))
+    logic.plan(10, 0)
+    # Woke up a second late: 1 planned tick plus 25 overdue ones.
+    assert len(list(logic.due(1010))) == 26
+    assert logic.skipped_ms > 0
+
+
+def test_unplanned_wakeup_is_capped():
+    logic = LogicScheduler(100, 25)
+    list(logic.due(0))
+    assert len(list(logic.due(1000))) == 25
+
+
+def test_fractional_period_is_kept_on_average():
+    logic = LogicScheduler(100)
+    timer = logic.timer()
+    timer.start(25)
+    fired = [i for i in range(1, 101) if timer.step()]
+    assert len(fired) == 40
+    assert fired[:4] == [3, 5, 8, 10]
+
+
+def test_first_delay_and_stop():
+    timer = LogicScheduler(100).timer()
+    timer.start(25, 250)
+    assert timer.remaining() == 25
+    fired = [i for i in range(1, 31) if timer.step()]
+    assert fired[0] == 25
+    timer.stop()
+    assert not timer.step() and timer.remaining() is None
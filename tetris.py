@@ -13,22 +13,40 @@
 #
 # Have fun!
 
+import argparse
 import os
+import random
 import sys
-from random import randrange as rand
 
 import pygame
-from screeninfo import get_monitors
 
-primary_monitor = [monitor for monitor in get_monitors()
-                   if monitor.is_primary][0]
+from assist import Assistant
+from board import BACKENDS, cols, rows
+from capture import FrameCapture, create_writer
+from engine import GameState, default_speed_curve, stepped_speed_curve
+from pacing import FramePacer
+from pointer import (MouseSource, OneEuroFilter, PointerPipeline, SwipeDetector,
+                     TraceSource, save_trace)
+from profiler import FrameProfiler
+from remote import RemoteGame
+from renderer import Renderer, create_texture_renderer
+from replay import Player, Recorder, max_seed
+from scheduler import LogicScheduler
+from widgets import DwellButton, WidgetLayer
 
 # The configuration
-# cell_size = 28
-cols = 10
-rows = 22
-cell_size = primary_monitor.height / (rows + 2)
+logical_cell_size = 32  # the canvas is scaled from this to the display
 maxfps = 120
+font_size = 22
+lookahead_poll_ms = 50
+capture_fps = 30
+tick_rate = 100  # logic ticks per second
+max_catch_up_ticks = 25
+soft_drop_delay_ms = 250
+soft_drop_repeat_ms = 25
+
+# Posted by a RemoteGame's reader thread when server updates arrive.
+remote_update = pygame.event.custom_type()
 
 colors = [
     (0,   0,   0),
@@ -42,420 +60,546 @@ colors = [
     (35,  35,  35)  # Helper color for background grid
 ]
 
-# Define the shapes of the single parts
-tetris_shapes = [
-    [[1, 1, 1],
-     [0, 1, 0]],
-
-    [[0, 2, 2],
-     [2, 2, 0]],
-
-    [[3, 3, 0],
-     [0, 3, 3]],
-
-    [[4, 0, 0],
-     [4, 4, 4]],
-
-    [[0, 0, 5],
-     [5, 5, 5]],
-
-    [[6, 6, 6, 6]],
-
-    [[7, 7],
-     [7, 7]]
-]
-
-
-def rotate_clockwise(shape):
-    return [
-        [shape[y][x] for y in range(len(shape))]
-        for x in range(len(shape[0]) - 1, -1, -1)
-    ]
-
 
-def check_collision(board, shape, offset):
-    off_x, off_y = offset
-    for cy, row in enumerate(shape):
-        for cx, cell in enumerate(row):
-            try:
-                if cell and board[cy + off_y][cx + off_x]:
-                    return True
-            except IndexError:
-                return True
-    return False
+font_name = ("C:\\Windows\\Fonts\\arialbd.ttf" if os.name == "nt" else "/usr/share/fonts/truetype/msttcorefonts/Arial_Bold.ttf")
 
 
-def remove_row(board, row):
-    del board[row]
-    return [[0 for i in range(cols)]] + board
+def primary_display_size():
+    # SDL lists the primary display first.  Asking the already initialized
+    # video subsystem is far cheaper than probing every monitor, and also
+    # works under the dummy driver.
+    return pygame.display.get_desktop_sizes()[0]
 
 
-def join_matrixes(mat1, mat2, mat2_off):
-    off_x, off_y = mat2_off
-    for cy, row in enumerate(mat2):
-        for cx, val in enumerate(row):
-            mat1[cy+off_y-1][cx+off_x] += val
-    return mat1
-
-
-def new_board():
-    board = [
-        [0 for x in range(cols)]
-        for y in range(rows)
-    ]
-    board += [[1 for x in range(cols)]]
-    return board
+def load_font(size):
+    # Fall back to pygame's bundled font right away when Arial is missing
+    # instead of failing, as it does on most Linux images.
+    if os.path.exists(font_name):
+        try:
+            return pygame.font.Font(font_name, size)
+        except (IOError, OSError):
+            pass
+    return pygame.font.Font(None, size)
 
 
 class TetrisApp(object):
-    def __init__(self):
-        pygame.init()
+    def __init__(self, board_backend='bitboard', max_fps=maxfps, seed=None,
+                 assist=0, lookahead_workers=0,
+                 show_ghost=False, record=None, replay=None, replay_speed=1,
+                 profile=False, profile_path=None, profile_overlay=False,
+                 renderer='software', native_resolution=False,
+                 smoothing=None, pointer_trace=None, record_pointer=None,
+                 tick_rate=tick_rate, speed_curve=default_speed_curve,
+                 connect=None, watch=None, capture=None, capture_fps=capture_fps,
+                 capture_scale=1.0):
+        if record is not None and seed is None:
+            # A recording is only reproducible with a known seed.
+            seed = random.SystemRandom().randrange(2**32)
+        if connect is None:
+            self.game = GameState(seed, board_backend, speed_curve=speed_curve)
+        self.show_ghost = show_ghost
+        self.assistant = (Assistant(assist, lookahead_workers=lookahead_workers)
+                          if assist else None)
+        self.max_fps = max_fps
+        self.profiler = (FrameProfiler(max_fps, path=profile_path or None)
+                         if profile or profile_path or profile_overlay else None)
+        self.profile_overlay = profile_overlay
+        self.logic = LogicScheduler(tick_rate, max_catch_up_ticks)
+        self.gravity = self.logic.timer()
+        self.soft_drop_timer = self.logic.timer()
+        # Only the subsystems the game uses; pygame.init() would also bring
+        # up audio and joystick support, which costs startup time.
+        pygame.display.init()
+        pygame.font.init()
         pygame.key.set_repeat(250, 25)
-        self.width = primary_monitor.width
-        self.height = cell_size*(rows+2)
-        self.rlim = self.width / 2
+        if connect is not None:
+            # The game runs on a server (see server.py); a player starts a
+            # new session, watch follows an existing one.
+            self.game = RemoteGame(
+                connect, watch, seed,
+                lambda: pygame.event.post(pygame.event.Event(remote_update)))
+            print("%s session %d on %s" % ("playing" if watch is None else "watching",
+                                           self.game.session, connect), flush=True)
+        if record is not None:
+            self.game = Recorder(self.game, open(record, 'wb'), pygame.time.get_ticks)
+        # When replaying a log, it supplies every input and gravity tick.
+        self.player = (Player(replay, replay_speed, pygame.time.get_ticks)
+                       if replay is not None else None)
+        display_width, display_height = primary_display_size()
+        if native_resolution:
+            # Draw at the display's own resolution, nothing is scaled.
+            self.cell_size = display_height // (rows + 2)
+            self.width, self.height = display_width, self.cell_size*(rows+2)
+            self.display_size = (self.width, self.height)
+        else:
+            # Draw on a fixed logical canvas as tall as rows+2 cells and as
+            # wide as the display's aspect ratio allows.
+            self.cell_size = logical_cell_size
+            self.height = logical_cell_size*(rows+2)
+            self.width = display_width * self.height // display_height
+            self.display_size = (display_width, display_height)
+        cell_size = self.cell_size
+        self.rlim = self.width // 2
         self.llim = self.rlim - cell_size*cols
         self.bground_grid = [[8 if x % 2 == y % 2 else 0 for x in range(cols)] for y in range(rows)]
 
-        font_name = ("C:\\Windows\\Fonts\\arialbd.ttf" if os.name == "nt" else "/usr/share/fonts/truetype/msttcorefonts/Arial_Bold.ttf")
-        self.default_font = pygame.font.Font(
-            font_name, 22)
-
-        self.screen = pygame.display.set_mode((self.width, self.height), pygame.FULLSCREEN)
-        pygame.event.set_blocked(pygame.MOUSEMOTION)
-        self.next_stone = tetris_shapes[rand(len(tetris_shapes))]
-        self.mouse_enter_pos = None
-        self.mouse_leave_pos = None
-        self.event_time = None
-        self.event_time_start = None
-        self.init_game()
-
-    def new_stone(self):
-        self.stone = self.next_stone[:]
-        self.next_stone = tetris_shapes[rand(len(tetris_shapes))]
-        self.stone_x = int(cols / 2 - len(self.stone[0])/2)
-        self.stone_y = 0
-
-        if check_collision(self.board,
-                           self.stone,
-                           (self.stone_x, self.stone_y)):
-            self.gameover = True
-
-    def init_game(self):
-        self.board = new_board()
-        self.new_stone()
-        self.level = 1
-        self.score = 0
-        self.lines = 0
-        pygame.time.set_timer(pygame.USEREVENT+1, 1000)
+        self.default_font = load_font(font_size)
+
+        logical_size = (self.width, self.height)
+        self.screen = None
+        self.renderer = None
+        if renderer == 'sdl2':
+            self.renderer = create_texture_renderer(
+                self.display_size, self.default_font, cell_size, colors, logical_size)
+            if self.renderer is not None:
+                self.display_size = self.renderer.window.size
+            else:
+                print("SDL2 hardware renderer unavailable, using software rendering",
+                      file=sys.stderr)
+        if self.renderer is None:
+            self.screen = pygame.display.set_mode(self.display_size, pygame.FULLSCREEN)
+            # The mode granted may differ from the one asked for.
+            self.display_size = self.screen.get_size()
+            self.renderer = Renderer(self.screen, self.default_font, cell_size, colors,
+                                     logical_size)
+        pygame.mouse.set_visible(False)
+        # Video of the session, written from a worker thread.
+        self.capture = (FrameCapture(create_writer(capture, capture_fps), capture_fps,
+                                     capture_scale)
+                        if capture is not None else None)
+        self.swipe_area = pygame.Rect(self.rlim+cell_size, cell_size*10, cell_size*6, cell_size*6)
+        self.widget_layers = {
+            'gameover': WidgetLayer([
+                DwellButton((self.width-cell_size*23.3, cell_size*(rows*0.62), cell_size*4, cell_size*2),
+                            self.game.start_game,
+                            "Continue", (self.width-cell_size*22.3, cell_size*(rows*0.65)),
+                            "Continuing in:", (self.width-cell_size*22.8, cell_size*(rows*0.64)),
+                            (self.width-cell_size*21.4, cell_size*(rows*0.67)),
+                            digit_color=colors[1])]),
+            'paused': WidgetLayer([
+                DwellButton((self.width-cell_size*23.3, cell_size*(rows*0.6), cell_size*4, cell_size*2),
+                            self.game.toggle_pause,
+                            "Unpause", (self.width-cell_size*22.3, cell_size*(rows*0.63)),
+                            "Unpausing in:", (self.width-cell_size*22.8, cell_size*(rows*0.62)),
+                            (self.width-cell_size*21.4, cell_size*(rows*0.65)),
+                            digit_color=colors[1])]),
+            'playing': WidgetLayer([
+                DwellButton((self.rlim+cell_size*3, cell_size*(rows - 4), cell_size*4, cell_size*2),
+                            self.game.toggle_pause,
+                            "Pause", (self.rlim+cell_size*4.3, cell_size*(rows - 3.3)),
+                            "Pausing in:", (self.rlim+cell_size*3.8, cell_size*(rows - 3.5)),
+                            (self.rlim+cell_size*4.9, cell_size*(rows - 2.9)),
+                            digit_color=colors[1]),
+                DwellButton((self.rlim+cell_size*3, cell_size*(rows - 1), cell_size*4, cell_size*2),
+                            self.quit,
+                            "Exit", (self.rlim+cell_size*4.5, cell_size*(rows - 0.4)),
+                            "Exiting in:", (self.rlim+cell_size*3.9, cell_size*(rows - 0.5)),
+                            (self.rlim+cell_size*4.9, cell_size*(rows + 0.1)),
+                            digit_color=colors[1])]),
+        }
+        if self.assistant is not None:
+            for i in range(assist):
+                left, top = self.llim-cell_size*6, cell_size*(2 + 3*i)
+                self.widget_layers['playing'].add(DwellButton(
+                    (left, top, cell_size*4, cell_size*2),
+                    lambda i=i: self.assistant.apply(self.game, i),
+                    "Place %d" % (i+1), (left+cell_size*1.0, top+cell_size*0.7),
+                    "Placing in:", (left+cell_size*0.7, top+cell_size*0.5),
+                    (left+cell_size*1.9, top+cell_size*1.1),
+                    digit_color=colors[1]))
+        self.suggestions_changed = False
+        self.screen_name = None
+        # Pointer samples come from mouse motion events or a recorded
+        # trace; smoothing is an optional filter such as OneEuroFilter.
+        # The SDL2 renderer's logical size already maps mouse events to
+        # canvas coordinates, but not pygame.mouse.get_pos().
+        source = (TraceSource.load(pointer_trace) if pointer_trace is not None
+                  else MouseSource(self.to_canvas(pygame.mouse.get_pos()),
+                                   None if self.screen is None else self.to_canvas))
+        self.pointer = PointerPipeline(source, smoothing,
+                                       SwipeDetector(self.swipe_area, cell_size*5),
+                                       keep_trace=record_pointer is not None)
+        self.record_pointer = record_pointer
+
+    def to_canvas(self, pos):
+        # A window position in canvas coordinates.
+        x, y = pos
+        return (x * self.width // self.display_size[0],
+                y * self.height // self.display_size[1])
 
     def disp_msg(self, msg, topleft, text_color=(255, 255, 255), bg_color=(0, 0, 0)):
         x, y = topleft
         for line in msg.splitlines():
-            self.screen.blit(
-                self.default_font.render(
-                    line,
-                    False,
-                    text_color,
-                    bg_color),
-                (x, y))
+            if line:
+                self.renderer.blit(
+                    self.renderer.text(line, text_color, bg_color),
+                    (int(x), int(y)))
             y += 14
 
     def center_msg(self, msg):
         for i, line in enumerate(msg.splitlines()):
-            msg_image = self.default_font.render(line, False,
-                                                 (255, 255, 255), (0, 0, 0))
+            if not line:
+                continue
+            msg_image = self.renderer.text(line, (255, 255, 255), (0, 0, 0))
 
             msgim_center_x, msgim_center_y = msg_image.get_size()
             msgim_center_x //= 2
             msgim_center_y //= 2
 
-            self.screen.blit(msg_image, (
-                self.width // 2-msgim_center_x,
-                self.height // 2-msgim_center_y+i*22))
+            self.renderer.blit(msg_image, (
+                int(self.width // 2-msgim_center_x),
+                int(self.height // 2-msgim_center_y+i*22)))
 
-    def draw_matrix(self, matrix, offset):
+    def draw_matrix(self, matrix, offset, ghost=False):
         off_x, off_y = offset
-        off_x = off_x + self.llim / cell_size
-        off_y = off_y + 1
-        for y, row in enumerate(matrix):
-            for x, val in enumerate(row):
-                if val:
-                    pygame.draw.rect(
-                        self.screen,
-                        colors[val if y < rows else 0],
-                        pygame.Rect(
-                            (off_x+x) * cell_size,
-                            (off_y+y) * cell_size,
-                            cell_size,
-                            cell_size),
-                        0
-                    )
-                    pygame.draw.rect(
-                        self.screen,
-                        colors[-1 if y < rows else 0],
-                        pygame.Rect(
-                            (off_x+x) * cell_size,
-                            (off_y+y) * cell_size,
-                            cell_size,
-                            cell_size),
-                        2
-                    )
-
-    def add_cl_lines(self, n):
-        linescores = [0, 40, 100, 300, 1200]
-        self.lines += n
-        self.score += linescores[n] * self.level
-        if self.lines >= self.level*6:
-            self.level += 1
-            newdelay = 1000-50*(self.level-1)
-            newdelay = 100 if newdelay < 100 else newdelay
-            pygame.time.set_timer(pygame.USEREVENT+1, newdelay)
-
-    def move(self, delta_x):
-        if not self.gameover and not self.paused:
-            new_x = self.stone_x + delta_x
-            if new_x < 0:
-                new_x = 0
-            if new_x > cols - len(self.stone[0]):
-                new_x = cols - len(self.stone[0])
-            if not check_collision(self.board,
-                                   self.stone,
-                                   (new_x, self.stone_y)):
-                self.stone_x = new_x
+        self.renderer.queue_cells(
+            matrix, (self.llim + off_x*self.cell_size, (off_y + 1)*self.cell_size),
+            rows, ghost)
+
+    def build_gameover_layer(self, surface):
+        surface.fill((0, 0, 0))
+        self.widget_layers['gameover'].draw_static(surface)
+
+    def build_paused_layer(self, surface):
+        surface.fill((0, 0, 0))
+        self.widget_layers['paused'].draw_static(surface)
+
+    def build_playing_layer(self, surface):
+        surface.fill((0, 0, 0))
+        pygame.draw.rect(surface,
+                         (35,  35,  35),
+                         self.swipe_area, 0, 20)
+        pygame.draw.rect(surface,
+                         (255,  255,  255),
+                         self.swipe_area, 1, 20)
+        self.renderer.draw_cells(surface, self.bground_grid,
+                                 (self.llim, self.cell_size))
+        pygame.draw.rect(surface,
+                         (255, 255, 255),
+                         (self.llim-1,
+                          self.cell_size-1,
+                          self.cell_size*cols+2,
+                          self.cell_size*rows+2), 1)
+        self.widget_layers['playing'].draw_static(surface)
+
+    def logic_tick(self, now):
+        # One fixed step of game logic standing for wall time now.
+        profiler = self.profiler
+        samples, swipes = self.pointer.update(now)
+        # The assistant's dwell buttons apply the suggestions they show,
+        # so those must be for the stone as it is now.
+        if self.assistant is not None and self.assistant.update(self.game):
+            self.suggestions_changed = True
+        # Dwell timers advance with every sample at its own time, then
+        # up to now for a pointer resting in place.
+        for sample_time, pos in samples:
+            self.update_widgets(pos, sample_time)
+        self.update_widgets(self.pointer.position, now)
+        if profiler is not None:
+            profiler.lap('widgets')
+        for _, direction in swipes:
+            self.swipe(direction)
+        # The engine only reports the delay; restart the timer when the
+        # level (or a new game) changes it.
+        delay = self.game.gravity_delay
+        if delay != self.gravity.period:
+            self.gravity.start(delay)
+        if self.gravity.step():
+            self.game.tick()
+        if self.soft_drop_timer.step():
+            self.game.soft_drop()
+        if profiler is not None:
+            profiler.lap('logic')
+
+    def start_soft_drop(self):
+        # Holding Down drops one row now, then repeats on logic ticks until
+        # the key is released; the key's own auto-repeat is ignored.
+        if not self.soft_drop_timer.running:
+            self.game.soft_drop()
+            self.soft_drop_timer.start(soft_drop_repeat_ms, soft_drop_delay_ms)
 
     def quit(self):
-        self.screen.fill((0, 0, 0))
+        if self.assistant is not None:
+            self.assistant.close()
+        if isinstance(self.game, (Recorder, RemoteGame)):
+            self.game.close()
+        if self.record_pointer is not None:
+            save_trace(self.record_pointer, self.pointer.trace)
+        if self.capture is not None:
+            self.capture.close()
+            print("capture:", self.capture.report())
+        if self.profiler is not None:
+            print("profile:", self.profiler.report())
+            self.profiler.close()
+        self.renderer.begin('exiting', lambda surface: surface.fill((0, 0, 0)))
         self.center_msg("Exiting...")
-        pygame.display.update()
+        self.renderer.present()
         sys.exit()
 
-    def drop(self, manual):
-        if not self.gameover and not self.paused:
-            self.score += 1 if manual else 0
-            self.stone_y += 1
-            if check_collision(self.board,
-                               self.stone,
-                               (self.stone_x, self.stone_y)):
-                self.board = join_matrixes(
-                    self.board,
-                    self.stone,
-                    (self.stone_x, self.stone_y))
-                self.new_stone()
-                cleared_rows = 0
-                while True:
-                    for i, row in enumerate(self.board[:-1]):
-                        if 0 not in row:
-                            self.board = remove_row(
-                                self.board, i)
-                            cleared_rows += 1
-                            break
-                    else:
-                        break
-                self.add_cl_lines(cleared_rows)
-                return True
-        return False
-
-    def insta_drop(self):
-        if not self.gameover and not self.paused:
-            while (not self.drop(True)):
-                pass
-
-    def rotate_stone(self):
-        if not self.gameover and not self.paused:
-            new_stone = rotate_clockwise(self.stone)
-            if not check_collision(self.board,
-                                   new_stone,
-                                   (self.stone_x, self.stone_y)):
-                self.stone = new_stone
-
-    def toggle_pause(self):
-        self.paused = not self.paused
-
-    def start_game(self):
-        if self.gameover:
-            self.init_game()
-            self.gameover = False
+    def current_screen(self):
+        if self.game.gameover:
+            return 'gameover'
+        return 'paused' if self.game.paused else 'playing'
+
+    def update_widgets(self, mouse_pos, now):
+        screen_name = self.current_screen()
+        if screen_name != self.screen_name:
+            if self.screen_name is not None:
+                self.widget_layers[self.screen_name].reset()
+            self.screen_name = screen_name
+        self.widget_layers[screen_name].update(mouse_pos, now)
+
+    def draw_suggestions(self):
+        for i, placement in enumerate(self.assistant.suggestions):
+            self.draw_matrix(placement.piece.shape, (placement.x, placement.y), ghost=True)
+            cx, cy = placement.piece.cells[0]
+            self.renderer.blit(
+                self.renderer.text("%d" % (i+1), (255, 255, 255), None),
+                (int(self.llim + (placement.x+cx+0.3)*self.cell_size),
+                 int((placement.y+cy+1.2)*self.cell_size)))
+
+    def draw_frame(self, mouse_pos):
+        game = self.game
+        if game.gameover:
+            self.renderer.begin('gameover', self.build_gameover_layer)
+            self.center_msg("""Game Over!\n\nYour score: %d""" % game.score)
+        elif game.paused:
+            self.renderer.begin('paused', self.build_paused_layer)
+            self.center_msg("Paused")
+        else:
+            self.renderer.begin('playing', self.build_playing_layer)
+            self.disp_msg("\nNext:", (self.rlim+self.cell_size, self.cell_size))
+            self.disp_msg("Score: %d\n\n\nLevel: %d\n\n\nLines: %d" % (game.score, game.level, game.lines), (self.rlim+self.cell_size, self.cell_size*6))
+            self.draw_matrix(game.cells(), (0, 0))
+            if self.assistant is not None:
+                self.draw_suggestions()
+            if self.show_ghost:
+                self.draw_matrix(game.stone.shape, (game.stone_x, game.ghost_y()), ghost=True)
+            self.draw_matrix(game.stone.shape, (game.stone_x, game.stone_y))
+            self.draw_matrix(game.next_stone.shape, (cols+1, 2))
+        self.widget_layers[self.current_screen()].draw(self.renderer)
+        if self.profile_overlay:
+            self.disp_msg("\n\n".join(self.profiler.overlay_lines()), (4, 4),
+                          (255, 255, 0))
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.lap('draw')
+        self.renderer.present(mouse_pos, self.cell_size/1.5)
+        if profiler is not None:
+            profiler.lap('present')
+        if self.capture is not None:
+            self.capture.offer(self.renderer.capture_source, (mouse_pos, self.cell_size/1.5))
+            if profiler is not None:
+                profiler.lap('capture')
 
     def run(self):
         key_actions = {
             'ESCAPE':   self.quit,
-            'LEFT': lambda: self.move(-1),
-            'RIGHT': lambda: self.move(+1),
-            'DOWN': lambda: self.drop(True),
-            'UP':       self.rotate_stone,
-            'p':        self.toggle_pause,
-            'SPACE':    self.start_game,
-            'RETURN':   self.insta_drop
+            'LEFT': lambda: self.game.move(-1),
+            'RIGHT': lambda: self.game.move(+1),
+            'DOWN':     self.start_soft_drop,
+            'UP':       self.game.rotate,
+            'p':        self.game.toggle_pause,
+            'SPACE':    self.game.start_game,
+            'RETURN':   self.game.hard_drop
         }
 
-        self.gameover = False
-        self.paused = False
-
-        dont_burn_my_cpu = pygame.time.Clock()
-        seconds_left = [3, 2, 1, 0]
+        dont_burn_my_cpu = FramePacer(self.max_fps)
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start()
+        if self.player is not None:
+            self.run_replay(dont_burn_my_cpu)
         while 1:
-            self.screen.fill((0, 0, 0))
-            if self.gameover:
-                self.center_msg("""Game Over!\n\nYour score: %d""" % self.score)
-                continue_button = pygame.Rect(self.width-cell_size*23.3, cell_size*(rows*0.62), cell_size*4, cell_size*2)
-                pygame.draw.rect(self.screen, (35,  35,  35), continue_button, 0, 20)                                        
-                pygame.draw.rect(self.screen, (255,  255,  255), continue_button, 1, 20)
-                if self.event_time_start is None and continue_button.collidepoint(pygame.mouse.get_pos()):
-                    self.event_time_start = pygame.time.get_ticks()
-                elif self.event_time_start is not None and not continue_button.collidepoint(pygame.mouse.get_pos()) and not exit_button.collidepoint(pygame.mouse.get_pos()):
-                    self.event_time_start = None
-                    self.event_time = None
-                if self.event_time_start is not None and continue_button.collidepoint(pygame.mouse.get_pos()):
-                    self.event_time = int((pygame.time.get_ticks() - self.event_time_start) / 1000)
-                    if self.event_time > 3:
-                        self.event_time_start = None
-                        self.event_time = None
-                        self.start_game()
-                        
-                if self.event_time is not None and continue_button.collidepoint(pygame.mouse.get_pos()):
-                    self.disp_msg("Continuing in:", (self.width-cell_size*22.8, cell_size*(rows*0.64)), bg_color=(35,  35,  35))
-                    self.disp_msg("%d" % (seconds_left[self.event_time]), (self.width-cell_size*21.4, cell_size*(rows*0.67)), text_color=colors[1], bg_color=(35,  35,  35))
-                else:
-                    self.disp_msg("Continue", (self.width-cell_size*22.3, cell_size*(rows*0.65)), bg_color=(35,  35,  35))
-            else:
-                if self.paused:
-                    self.center_msg("Paused")
-                    unpause_button = pygame.Rect(self.width-cell_size*23.3, cell_size*(rows*0.6), cell_size*4, cell_size*2)
-                    pygame.draw.rect(self.screen, (35,  35,  35), unpause_button, 0, 20)                                        
-                    pygame.draw.rect(self.screen, (255,  255,  255), unpause_button, 1, 20)
-                    if self.event_time_start is None and unpause_button.collidepoint(pygame.mouse.get_pos()):
-                        self.event_time_start = pygame.time.get_ticks()
-                    elif self.event_time_start is not None and not unpause_button.collidepoint(pygame.mouse.get_pos()) and not exit_button.collidepoint(pygame.mouse.get_pos()):
-                        self.event_time_start = None
-                        self.event_time = None
-                    if self.event_time_start is not None and unpause_button.collidepoint(pygame.mouse.get_pos()):
-                        self.event_time = int((pygame.time.get_ticks() - self.event_time_start) / 1000)
-                        if self.event_time > 3:
-                            self.event_time_start = None
-                            self.event_time = None
-                            self.toggle_pause()
-                    
-                    if self.event_time is not None and unpause_button.collidepoint(pygame.mouse.get_pos()):
-                        self.disp_msg("Unpausing in:", (self.width-cell_size*22.8, cell_size*(rows*0.62)), bg_color=(35,  35,  35))
-                        self.disp_msg("%d" % (seconds_left[self.event_time]), (self.width-cell_size*21.4, cell_size*(rows*0.65)), text_color=colors[1], bg_color=(35,  35,  35))
-                    else:
-                        self.disp_msg("Unpause", (self.width-cell_size*22.3, cell_size*(rows*0.63)), bg_color=(35,  35,  35))
-                else:
-                    self.disp_msg("\nNext:", (self.rlim+cell_size, cell_size))
-                    self.disp_msg("Score: %d\n\n\nLevel: %d\n\n\nLines: %d" % (self.score, self.level, self.lines), (self.rlim+cell_size, cell_size*6))
-                            
-                    pygame.draw.rect(self.screen,
-                                     (35,  35,  35),
-                                     (self.rlim+cell_size,
-                                      cell_size*10,
-                                      cell_size*6,
-                                      cell_size*6), 0, 20)                                        
-                    pygame.draw.rect(self.screen,
-                                     (255,  255,  255),
-                                     (self.rlim+cell_size,
-                                      cell_size*10,
-                                      cell_size*6,
-                                      cell_size*6), 1, 20)
-                    self.draw_matrix(self.bground_grid, (0, 0))
-                    self.draw_matrix(self.board, (0, 0))
-                    self.draw_matrix(self.stone, (self.stone_x, self.stone_y))
-                    self.draw_matrix(self.next_stone, (cols+1, 2))
-                    pygame.draw.rect(self.screen,
-                                     (255, 255, 255),
-                                     (self.llim-1,
-                                      cell_size-1,
-                                      cell_size*cols+2,
-                                      cell_size*rows+2), 1)
-                    pause_button = pygame.Rect(self.rlim+cell_size*3, cell_size*(rows - 4), cell_size*4, cell_size*2)
-                    exit_button = pygame.Rect(self.rlim+cell_size*3, cell_size*(rows - 1), cell_size*4, cell_size*2)
-                    pygame.draw.rect(self.screen, (35,  35,  35), pause_button, 0, 20)                                        
-                    pygame.draw.rect(self.screen, (255,  255,  255), pause_button, 1, 20)
-                    pygame.draw.rect(self.screen, (35,  35,  35), exit_button, 0, 20)                                        
-                    pygame.draw.rect(self.screen, (255,  255,  255), exit_button, 1, 20)
-                    
-                    if self.event_time_start is None and pause_button.collidepoint(pygame.mouse.get_pos()):
-                        self.event_time_start = pygame.time.get_ticks()
-                    elif self.event_time_start is not None and not pause_button.collidepoint(pygame.mouse.get_pos()) and not exit_button.collidepoint(pygame.mouse.get_pos()):
-                        self.event_time_start = None
-                        self.event_time = None
-                    if self.event_time_start is not None and pause_button.collidepoint(pygame.mouse.get_pos()):
-                        self.event_time = int((pygame.time.get_ticks() - self.event_time_start) / 1000)
-                        if self.event_time > 3:
-                            self.event_time_start = None
-                            self.event_time = None
-                            self.toggle_pause()
-                    
-                    if self.event_time_start is None and exit_button.collidepoint(pygame.mouse.get_pos()):
-                        self.event_time_start = pygame.time.get_ticks()
-                    elif self.event_time_start is not None and not exit_button.collidepoint(pygame.mouse.get_pos()) and not pause_button.collidepoint(pygame.mouse.get_pos()):
-                        self.event_time_start = None
-                        self.event_time = None
-                    if self.event_time_start is not None and exit_button.collidepoint(pygame.mouse.get_pos()):
-                        self.event_time = int((pygame.time.get_ticks() - self.event_time_start) / 1000)
-                        if self.event_time > 3:
-                            self.event_time_start = None
-                            self.event_time = None
-                            self.quit()
-                    
-                    if self.event_time is not None and pause_button.collidepoint(pygame.mouse.get_pos()):
-                        self.disp_msg("Pausing in:", (self.rlim+cell_size*3.8, cell_size*(rows - 3.5)), bg_color=(35,  35,  35))
-                        self.disp_msg("%d" % (seconds_left[self.event_time]), (self.rlim+cell_size*4.9, cell_size*(rows - 2.9)), text_color=colors[1], bg_color=(35,  35,  35))
-                    else:
-                        self.disp_msg("Pause", (self.rlim+cell_size*4.3, cell_size*(rows - 3.3)), bg_color=(35,  35,  35))
-                    
-                    if self.event_time is not None and exit_button.collidepoint(pygame.mouse.get_pos()):
-                        self.disp_msg("Exiting in:", (self.rlim+cell_size*3.9, cell_size*(rows - 0.5)), bg_color=(35,  35,  35))
-                        self.disp_msg("%d" % (seconds_left[self.event_time]), (self.rlim+cell_size*4.9, cell_size*(rows + 0.1)), text_color=colors[1], bg_color=(35,  35,  35))
-                    else:
-                        self.disp_msg("Exit", (self.rlim+cell_size*4.5, cell_size*(rows - 0.4)), bg_color=(35,  35,  35))
-            
-            pygame.mouse.set_visible(False)        
-            pygame.draw.circle(self.screen, (255, 0, 255), pygame.mouse.get_pos(), cell_size/1.5, 2)
-            pygame.draw.circle(self.screen, (255, 0, 255), pygame.mouse.get_pos(), 4)
-            pygame.display.update()
-
-            for event in pygame.event.get():
-                if event.type == pygame.USEREVENT+1:
-                    self.drop(False)
+            for now in self.logic.due(pygame.time.get_ticks()):
+                self.logic_tick(now)
+            mouse_pos = self.pointer.position
+            if self.assistant is not None and (self.assistant.update(self.game)
+                                               or self.suggestions_changed):
+                self.suggestions_changed = False
+                dont_burn_my_cpu.invalidate()
+            if profiler is not None:
+                profiler.lap('logic')
+            rendered = dont_burn_my_cpu.frame_due(mouse_pos)
+            if rendered:
+                self.draw_frame(mouse_pos)
+            if profiler is not None:
+                profiler.end_frame(rendered)
+
+            # Sleep until the next tick at which something happens: a
+            # gravity step, a held soft drop, the next dwell countdown step
+            # (even if the pointer is held perfectly still), pointer
+            # samples waiting to be processed or a frame the capture
+            # skipped.
+            now = pygame.time.get_ticks()
+            logic = self.logic
+            wakeups = [logic.ms_until(self.gravity.remaining(), now),
+                       logic.ms_until(self.soft_drop_timer.remaining(), now),
+                       self.pointer.next_due_in(now)]
+            dwell = self.widget_layers[self.screen_name].next_step_in(now)
+            if dwell is not None:
+                wakeups.append(logic.wake_in(dwell, now))
+            if self.pointer.pending:
+                wakeups.append(logic.ms_until(1, now))
+            if self.capture is not None:
+                wakeups.append(self.capture.next_due_in(now))
+            wakeups = [wakeup for wakeup in wakeups if wakeup is not None]
+            timeout = min(wakeups) if wakeups else None
+            if self.assistant is not None and self.assistant.pending is not None:
+                # Poll the lookahead search without blocking on it.
+                timeout = min(timeout or lookahead_poll_ms, lookahead_poll_ms)
+
+            logic.plan(dont_burn_my_cpu.idle_timeout if timeout is None else timeout, now)
+            events = dont_burn_my_cpu.wait(timeout)
+            # pygame does not pass on SDL's event timestamps; the time the
+            # events were received is the closest to when they happened.
+            received = pygame.time.get_ticks()
+            if profiler is not None:
+                profiler.start()
+            # Bring the logic up to the present before applying input, so
+            # a key press does not land in ticks that stand for the past.
+            for now in self.logic.due(pygame.time.get_ticks()):
+                self.logic_tick(now)
+            for event in events:
+                if event.type == pygame.MOUSEMOTION:
+                    self.pointer.feed(event, received)
                 elif event.type == pygame.QUIT:
                     self.quit()
+                elif event.type == remote_update:
+                    if not self.game.apply_updates():
+                        print("the server closed the session", file=sys.stderr)
+                        self.quit()
                 elif event.type == pygame.KEYDOWN:
                     for key in key_actions:
                         if event.key == eval("pygame.K_" + key):
                             key_actions[key]()
-            
-            swipe_area = pygame.Rect(self.rlim+cell_size, cell_size*10, cell_size*6, cell_size*6)
-            mouse_pos = pygame.mouse.get_pos()
-            
-            if self.mouse_enter_pos is None and swipe_area.collidepoint(mouse_pos):
-                self.mouse_enter_pos = mouse_pos
-            elif self.mouse_leave_pos is None and self.mouse_enter_pos is not None and not swipe_area.collidepoint(mouse_pos):
-                self.mouse_leave_pos = mouse_pos
-            if self.mouse_enter_pos is not None and self.mouse_leave_pos is not None:
-                if self.mouse_enter_pos[0] - self.mouse_leave_pos[0] > cell_size*5:
-                    self.move(-1)
-                    self.mouse_enter_pos = None
-                    self.mouse_leave_pos = None
-                elif self.mouse_enter_pos[0] - self.mouse_leave_pos[0] < -cell_size*5:
-                    self.move(+1)
-                    self.mouse_enter_pos = None
-                    self.mouse_leave_pos = None
-                elif self.mouse_enter_pos[1] - self.mouse_leave_pos[1] > cell_size*5:
-                    self.rotate_stone()
-                    self.mouse_enter_pos = None
-                    self.mouse_leave_pos = None
-                elif self.mouse_enter_pos[1] - self.mouse_leave_pos[1] < -cell_size*5:
-                    self.insta_drop()
-                    self.mouse_enter_pos = None
-                    self.mouse_leave_pos = None
-                else:
-                    self.mouse_enter_pos = None
-                    self.mouse_leave_pos = None
-            
-            dont_burn_my_cpu.tick(maxfps)
+                elif event.type == pygame.KEYUP and event.key == pygame.K_DOWN:
+                    self.soft_drop_timer.stop()
+            if profiler is not None:
+                profiler.lap('events')
+
+    def run_replay(self, dont_burn_my_cpu):
+        # Play back a recorded log; only Escape and closing the window are
+        # handled, the log drives everything else.
+        # Replays give the profiler identical input on every run, which
+        # makes them the fairest way to compare renderer changes.
+        profiler = self.profiler
+        self.screen_name = self.current_screen()
+        while 1:
+            self.player.apply_due(self.game)
+            if profiler is not None:
+                profiler.lap('logic')
+            rendered = dont_burn_my_cpu.frame_due(None)
+            if rendered:
+                self.draw_frame(None)
+            if profiler is not None:
+                profiler.end_frame(rendered)
+            wakeups = [self.player.next_due_in()]
+            if self.capture is not None:
+                wakeups.append(self.capture.next_due_in(pygame.time.get_ticks()))
+            wakeups = [wakeup for wakeup in wakeups if wakeup is not None]
+            events = dont_burn_my_cpu.wait(min(wakeups) if wakeups else None)
+            if profiler is not None:
+                profiler.start()
+            for event in events:
+                if event.type == pygame.QUIT:
+                    self.quit()
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                    self.quit()
+            if profiler is not None:
+                profiler.lap('events')
+
+    def swipe(self, direction):
+        if direction == 'left':
+            self.game.move(-1)
+        elif direction == 'right':
+            self.game.move(+1)
+        elif direction == 'up':
+            self.game.rotate()
+        elif direction == 'down':
+            self.game.hard_drop()
 
 
 if __name__ == '__main__':
-    App = TetrisApp()
+    parser = argparse.ArgumentParser(description="Tetris for assistive input devices")
+    parser.add_argument('--board', choices=BACKENDS,
+                        default=os.environ.get('TETRIS_BOARD', 'bitboard'),
+                        help="board backend (default: $TETRIS_BOARD or bitboard)")
+    parser.add_argument('--fps', type=int, default=maxfps,
+                        help="frame rate cap during active play (default: %d)" % maxfps)
+    parser.add_argument('--seed', type=int, default=None,
+                        help="seed for the piece sequence, 0 to 2**64-1 (default: random)")
+    parser.add_argument('--assist', type=int, default=0, metavar='K',
+                        help="offer the K best placements as dwell buttons")
+    parser.add_argument('--lookahead-workers', type=int, default=0, metavar='N',
+                        help="rank placements with next-stone lookahead in N processes")
+    parser.add_argument('--ghost', action='store_true',
+                        help="show where the falling stone will land")
+    parser.add_argument('--record', metavar='PATH', default=None,
+                        help="record the session to PATH for replay.py")
+    parser.add_argument('--profile', metavar='PATH',
+                        default=os.environ.get('TETRIS_PROFILE') or None,
+                        help="time every frame and write the data to PATH "
+                             "(.csv or .json; default: $TETRIS_PROFILE)")
+    parser.add_argument('--profile-overlay', action='store_true',
+                        default=bool(os.environ.get('TETRIS_PROFILE_OVERLAY')),
+                        help="show frame time percentiles on screen")
+    parser.add_argument('--renderer', choices=('software', 'sdl2'),
+                        default=os.environ.get('TETRIS_RENDERER', 'software'),
+                        help="draw in software or with the SDL2 hardware renderer, "
+                             "falling back to software (default: $TETRIS_RENDERER or software)")
+    parser.add_argument('--native-resolution', action='store_true',
+                        help="draw at the display resolution instead of scaling "
+                             "a %d pixel tall canvas" % (logical_cell_size*(rows+2)))
+    parser.add_argument('--smoothing', choices=('none', 'one-euro'), default='none',
+                        help="filter for pointer or gaze samples (default: none)")
+    parser.add_argument('--min-cutoff', type=float, default=1.0,
+                        help="One Euro filter cutoff at rest, in Hz (default: 1.0)")
+    parser.add_argument('--beta', type=float, default=0.007,
+                        help="One Euro filter speed coefficient (default: 0.007)")
+    parser.add_argument('--pointer-trace', metavar='PATH', default=None,
+                        help="take pointer samples from a recorded t,x,y CSV trace")
+    parser.add_argument('--record-pointer', metavar='PATH', default=None,
+                        help="save the raw pointer samples to PATH on exit")
+    parser.add_argument('--tick-rate', type=int, default=tick_rate, metavar='HZ',
+                        help="game logic ticks per second (default: %d)" % tick_rate)
+    parser.add_argument('--speed-curve', metavar='MS[,MS...]', default=None,
+                        help="gravity delay per level in ms, the last one for every "
+                             "later level (default: 1000 ms, 50 ms faster per level, "
+                             "at least 100 ms)")
+    parser.add_argument('--connect', metavar='ADDRESS', default=None,
+                        help="play on a server.py server at HOST:PORT or a Unix socket path")
+    parser.add_argument('--watch', type=int, metavar='SESSION', default=None,
+                        help="with --connect, follow a session instead of playing")
+    parser.add_argument('--capture', metavar='PATH',
+                        default=os.environ.get('TETRIS_CAPTURE') or None,
+                        help="record video of the session: PATH.mp4 (or another video "
+                             "extension) through ffmpeg, PATH.raw as raw frames, any other "
+                             "PATH as a directory of PNGs (default: $TETRIS_CAPTURE)")
+    parser.add_argument('--capture-fps', type=int, default=capture_fps,
+                        help="frames per second captured (default: %d)" % capture_fps)
+    parser.add_argument('--capture-scale', type=float, default=1.0,
+                        help="size of captured frames relative to the %d pixel tall "
+                             "canvas (default: 1.0)" % (logical_cell_size*(rows+2)))
+    args = parser.parse_args()
+    if args.watch is not None and args.connect is None:
+        parser.error("--watch needs --connect")
+    if args.record and args.connect:
+        parser.error("--record only works with a local game")
+    if args.seed is not None and not 0 <= args.seed <= max_seed:
+        parser.error("--seed must be between 0 and %d" % max_seed)
+    App = TetrisApp(board_backend=args.board, max_fps=args.fps, seed=args.seed,
+                    assist=args.assist, lookahead_workers=args.lookahead_workers,
+                    show_ghost=args.ghost, record=args.record,
+                    profile_path=args.profile, profile_overlay=args.profile_overlay,
+                    renderer=args.renderer, native_resolution=args.native_resolution,
+                    smoothing=(OneEuroFilter(args.min_cutoff, args.beta)
+                               if args.smoothing == 'one-euro' else None),
+                    pointer_trace=args.pointer_trace, record_pointer=args.record_pointer,
+                    tick_rate=args.tick_rate,
+                    speed_curve=(stepped_speed_curve(int(ms) for ms in args.speed_curve.split(','))
+                                 if args.speed_curve else default_speed_curve),
+                    connect=args.connect, watch=args.watch,
+                    capture=args.capture, capture_fps=args.capture_fps,
+                    capture_scale=args.capture_scale)
     App.run()
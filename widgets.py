@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Dwell-activated on-screen controls.
+#
+# A DwellButton fires its action once the pointer has rested on it for
+# dwell_steps whole steps, showing a countdown meanwhile.  Buttons are
+# registered once in a WidgetLayer, which is updated with a single
+# pointer sample per frame and finds the hovered button through a coarse
+# grid index, so the per-frame cost does not grow with the number of
+# controls on screen.  Every button keeps its own timer.
+
+import pygame
+
+
+class DwellButton(object):
+    def __init__(self, rect, action, label, label_pos,
+                 countdown_label, countdown_pos, digit_pos,
+                 dwell_steps=4, step_ms=1000,
+                 text_color=(255, 255, 255), digit_color=(255, 85, 85),
+                 bg_color=(35, 35, 35)):
+        self.rect = pygame.Rect(rect)
+        self.action = action
+        self.label = label
+        self.label_pos = (int(label_pos[0]), int(label_pos[1]))
+        self.countdown_label = countdown_label
+        self.countdown_pos = (int(countdown_pos[0]), int(countdown_pos[1]))
+        self.digit_pos = (int(digit_pos[0]), int(digit_pos[1]))
+        self.dwell_steps = dwell_steps
+        self.step_ms = step_ms
+        self.text_color = text_color
+        self.digit_color = digit_color
+        self.bg_color = bg_color
+        self.dwell_start = None
+        self.step = None
+        self.surfaces = None
+
+    def reset(self):
+        self.dwell_start = None
+        self.step = None
+
+    def update(self, hovered, now):
+        if not hovered:
+            self.reset()
+            return False
+        if self.dwell_start is None:
+            self.dwell_start = now
+        self.step = (now - self.dwell_start) // self.step_ms
+        if self.step >= self.dwell_steps:
+            self.reset()
+            return True
+        return False
+
+    def next_step_in(self, now):
+        if self.dwell_start is None:
+            return None
+        return self.step_ms - (now - self.dwell_start) % self.step_ms
+
+    def draw_static(self, surface):
+        pygame.draw.rect(surface, self.bg_color, self.rect, 0, 20)
+        pygame.draw.rect(surface, (255, 255, 255), self.rect, 1, 20)
+
+    def draw(self, renderer):
+        if self.surfaces is None:
+            self.surfaces = (
+                renderer.text(self.label, self.text_color, self.bg_color),
+                renderer.text(self.countdown_label, self.text_color, self.bg_color),
+                [renderer.text("%d" % (self.dwell_steps - 1 - step),
+                               self.digit_color, self.bg_color)
+                 for step in range(self.dwell_steps)])
+        label, countdown, digits = self.surfaces
+        if self.step is None:
+            renderer.blit(label, self.label_pos)
+        else:
+            renderer.blit(countdown, self.countdown_pos)
+            renderer.blit(digits[self.step], self.digit_pos)
+
+
+class WidgetLayer(object):
+    def __init__(self, widgets=(), bucket_size=64):
+        self.bucket_size = bucket_size
+        self.widgets = []
+        self.buckets = {}
+        self.hovered = None
+        for widget in widgets:
+            self.add(widget)
+
+    def add(self, widget):
+        self.widgets.append(widget)
+        size = self.bucket_size
+        rect = widget.rect
+        for bx in range(rect.left // size, (rect.right - 1) // size + 1):
+            for by in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                self.buckets.setdefault((bx, by), []).append(widget)
+
+    def hit(self, pos):
+        size = self.bucket_size
+        for widget in self.buckets.get((pos[0] // size, pos[1] // size), ()):
+            if widget.rect.collidepoint(pos):
+                return widget
+        return None
+
+    def reset(self):
+        for widget in self.widgets:
+            widget.reset()
+        self.hovered = None
+
+    def update(self, pos, now):
+        # Advance dwell timers for one pointer sample and run the action of
+        # a button whose dwell completed.
+        hovered = self.hit(pos)
+        if self.hovered is not None and self.hovered is not hovered:
+            self.hovered.reset()
+        self.hovered = hovered
+        if hovered is not None and hovered.update(True, now):
+            hovered.action()
+
+    def next_step_in(self, now):
+        if self.hovered is None:
+            return None
+        return self.hovered.next_step_in(now)
+
+    def draw_static(self, surface):
+        for widget in self.widgets:
+            widget.draw_static(surface)
+
+    def draw(self, renderer):
+        for widget in self.widgets:
+            widget.draw(renderer)